@@ -1,14 +1,19 @@
 // Read, Update, Delete specific article
 // Handles GET (read), PUT (update), DELETE (delete) with D1 database
+// PUT returns once D1 commits; GET /articles/:id/index-status reports the background embedding
+
+import { toTimestamp, vectorIdFor } from "./vectorize.js";
+import { indexArticles, INDEX_PENDING } from "./indexing.js";
 
 export default {
-  async fetch(request, env) {
+  async fetch(request, env, ctx) {
     const { method } = request;
     const url = new URL(request.url);
     
-    // Extract article ID from URL path
+    // Extract article ID from URL path (/articles/:id or /articles/:id/index-status)
     const pathParts = url.pathname.split("/");
-    const articleId = pathParts[pathParts.length - 1];
+    const isIndexStatus = pathParts[pathParts.length - 1] === "index-status";
+    const articleId = pathParts[pathParts.length - (isIndexStatus ? 2 : 1)];
 
     // CORS headers
     const corsHeaders = {
@@ -21,6 +26,11 @@ export default {
       return new Response(null, { headers: corsHeaders });
     }
 
+    // index-status is read-only; never let PUT/DELETE fall through to the article itself
+    if (isIndexStatus && method !== "GET") {
+      return new Response("Method not allowed", { status: 405, headers: corsHeaders });
+    }
+
     try {
       if (!env.DB) {
         return new Response(
@@ -32,6 +42,26 @@ export default {
         );
       }
 
+      // GET /articles/:id/index-status - Indexing state of one article
+      if (isIndexStatus) {
+        const result = await env.DB.prepare(
+          "SELECT id, index_status, index_attempts, indexed_at, updated_at FROM articles WHERE id = ?"
+        )
+          .bind(parseInt(articleId))
+          .first();
+
+        if (!result) {
+          return new Response(JSON.stringify({ error: "Article not found" }), {
+            status: 404,
+            headers: { ...corsHeaders, "Content-Type": "application/json" },
+          });
+        }
+
+        return new Response(JSON.stringify(result), {
+          headers: { ...corsHeaders, "Content-Type": "application/json" },
+        });
+      }
+
       // GET - Read article by ID
       if (method === "GET") {
         const result = await env.DB.prepare("SELECT * FROM articles WHERE id = ?")
@@ -66,7 +96,8 @@ export default {
 
         const result = await env.DB.prepare(
           `UPDATE articles 
-           SET title = ?, content = ?, tags = ?, author = ?, published_at = ?, updated_at = ?
+           SET title = ?, content = ?, tags = ?, author = ?, published_at = ?, published_ts = ?, updated_at = ?,
+               index_status = ?, index_attempts = 0
            WHERE id = ?
            RETURNING *`
         )
@@ -76,7 +107,9 @@ export default {
             tagsStr,
             author || null,
             published_at || null,
+            toTimestamp(published_at),
             now,
+            INDEX_PENDING,
             parseInt(articleId)
           )
           .first();
@@ -94,34 +127,10 @@ export default {
           tags: result.tags ? (typeof result.tags === 'string' ? JSON.parse(result.tags) : result.tags) : [],
         };
 
-        // Regenerate embedding if content changed
-        if (content && env.AI && env.VECTORIZE) {
-          try {
-            const embeddingResponse = await env.AI.run("@cf/baai/bge-base-en-v1.5", {
-              text: [content],
-            });
-
-            if (embeddingResponse && embeddingResponse.data && embeddingResponse.data.length > 0) {
-              const embedding = embeddingResponse.data[0];
-              const vectorId = `article_${updatedArticle.id}`;
-              
-              await env.VECTORIZE.insert([
-                {
-                  id: vectorId,
-                  values: embedding,
-                  metadata: {
-                    article_id: updatedArticle.id,
-                    title: updatedArticle.title,
-                    tags: updatedArticle.tags,
-                    published_at: updatedArticle.published_at,
-                  },
-                },
-              ]);
-            }
-          } catch (embedError) {
-            console.error("Error regenerating embedding for updated article:", embedError);
-            // Continue even if embedding fails
-          }
+        // Re-embed after responding (metadata may have changed even if content did not);
+        // the cron sweep retries anything left pending or failed
+        if (env.AI && env.VECTORIZE) {
+          ctx.waitUntil(indexArticles(env, [updatedArticle]));
         }
 
         return new Response(JSON.stringify(updatedArticle), {
@@ -149,19 +158,18 @@ export default {
           .run();
 
         // Delete from Vectorize if available
+        // A failure here leaves an orphan vector; the reconciler job (reconcile_vectors.py) removes those
+        let vectorDeleted = false;
         if (env.VECTORIZE) {
           try {
-            const vectorId = `article_${articleId}`;
-            // Note: Vectorize doesn't have a direct delete method in the current API
-            // You may need to upsert with empty values or handle this differently
-            // For now, we'll just log it
-            console.log(`Vector ${vectorId} should be deleted manually or via Vectorize dashboard`);
+            await env.VECTORIZE.deleteByIds([vectorIdFor(articleId)]);
+            vectorDeleted = true;
           } catch (vectorError) {
             console.error("Error deleting vector:", vectorError);
           }
         }
 
-        return new Response(JSON.stringify({ success: true, deleted: result.meta.changes > 0 }), {
+        return new Response(JSON.stringify({ success: true, deleted: result.meta.changes > 0, vector_deleted: vectorDeleted }), {
           headers: { ...corsHeaders, "Content-Type": "application/json" },
         });
       }
@@ -1,8 +1,16 @@
 // CRUD API for articles
 // Handles GET (list), POST (create) with D1 database
+// POST /articles/bulk restores articles with their original ids and never calls Workers AI
+// POST returns once D1 commits; the article is embedded in the background (see indexing.js)
+
+import { toTimestamp } from "./vectorize.js";
+import { indexArticles, INDEX_INDEXED, INDEX_PENDING } from "./indexing.js";
+
+// Upper bound on articles accepted by one bulk request (one D1 batch)
+const MAX_BULK_ARTICLES = 500;
 
 export default {
-  async fetch(request, env) {
+  async fetch(request, env, ctx) {
     const { method } = request;
     const url = new URL(request.url);
 
@@ -17,6 +25,14 @@ export default {
       return new Response(null, { headers: corsHeaders });
     }
 
+    // Sub-routes and ?fields= listings accept one method only; never fall through to list/create
+    const isIndexStatus = url.pathname.endsWith("/articles/index-status");
+    const isBulk = url.pathname.endsWith("/articles/bulk");
+    if (((isIndexStatus || url.searchParams.has("fields")) && method !== "GET") ||
+        (isBulk && method !== "POST")) {
+      return new Response("Method not allowed", { status: 405, headers: corsHeaders });
+    }
+
     try {
       if (!env.DB) {
         return new Response(
@@ -28,6 +44,149 @@ export default {
         );
       }
 
+      // GET ?fields=id - Page through article ids in id order (keyset pagination).
+      // Used by maintenance jobs that need the full id set without article bodies.
+      if (method === "GET" && url.searchParams.get("fields") === "id") {
+        const afterId = parseInt(url.searchParams.get("after_id")) || 0;
+        const limit = Math.min(parseInt(url.searchParams.get("limit")) || 1000, 5000);
+
+        const result = await env.DB.prepare(
+          "SELECT id FROM articles WHERE id > ? ORDER BY id LIMIT ?"
+        )
+          .bind(afterId, limit)
+          .all();
+
+        const ids = (result.results || []).map((row) => row.id);
+
+        return new Response(
+          JSON.stringify({
+            ids,
+            next_after_id: ids.length === limit ? ids[ids.length - 1] : null,
+          }),
+          {
+            headers: { ...corsHeaders, "Content-Type": "application/json" },
+          }
+        );
+      }
+
+      // GET ?fields=all - Page through full articles in id order (used by snapshot export)
+      if (method === "GET" && url.searchParams.get("fields") === "all") {
+        const afterId = parseInt(url.searchParams.get("after_id")) || 0;
+        const limit = Math.min(parseInt(url.searchParams.get("limit")) || 500, 1000);
+
+        const result = await env.DB.prepare(
+          "SELECT * FROM articles WHERE id > ? ORDER BY id LIMIT ?"
+        )
+          .bind(afterId, limit)
+          .all();
+
+        const articles = (result.results || []).map((article) => ({
+          ...article,
+          tags: article.tags ? (typeof article.tags === 'string' ? JSON.parse(article.tags) : article.tags) : [],
+        }));
+
+        return new Response(
+          JSON.stringify({
+            articles,
+            next_after_id: articles.length === limit ? articles[articles.length - 1].id : null,
+          }),
+          {
+            headers: { ...corsHeaders, "Content-Type": "application/json" },
+          }
+        );
+      }
+
+      // GET ?title=&published_at= - Articles with this exact title (and publish date).
+      // Lets retries check whether an insert whose response was lost actually committed.
+      if (method === "GET" && url.searchParams.has("title")) {
+        const publishedAt = url.searchParams.get("published_at");
+        const query = publishedAt !== null
+          ? env.DB.prepare("SELECT * FROM articles WHERE published_at = ? AND title = ? LIMIT 10")
+              .bind(publishedAt, url.searchParams.get("title"))
+          : env.DB.prepare("SELECT * FROM articles WHERE title = ? LIMIT 10")
+              .bind(url.searchParams.get("title"));
+        const result = await query.all();
+
+        const articles = (result.results || []).map((article) => ({
+          ...article,
+          tags: article.tags ? (typeof article.tags === 'string' ? JSON.parse(article.tags) : article.tags) : [],
+        }));
+
+        return new Response(JSON.stringify(articles), {
+          headers: { ...corsHeaders, "Content-Type": "application/json" },
+        });
+      }
+
+      // GET /articles/index-status - Count articles by indexing state
+      if (isIndexStatus) {
+        const result = await env.DB.prepare(
+          "SELECT index_status, COUNT(*) AS count FROM articles GROUP BY index_status"
+        ).all();
+
+        const counts = { pending: 0, indexed: 0, failed: 0 };
+        for (const row of result.results || []) {
+          counts[row.index_status] = row.count;
+        }
+
+        return new Response(JSON.stringify(counts), {
+          headers: { ...corsHeaders, "Content-Type": "application/json" },
+        });
+      }
+
+      // POST /articles/bulk - Insert or overwrite articles keyed by id, in one D1 batch
+      if (isBulk) {
+        const body = await request.json();
+        const articles = Array.isArray(body.articles) ? body.articles : [];
+
+        if (articles.length === 0 || articles.length > MAX_BULK_ARTICLES) {
+          return new Response(
+            JSON.stringify({ error: `articles must contain 1-${MAX_BULK_ARTICLES} items` }),
+            {
+              status: 400,
+              headers: { ...corsHeaders, "Content-Type": "application/json" },
+            }
+          );
+        }
+
+        const now = new Date().toISOString();
+        // ON CONFLICT ... DO UPDATE (not INSERT OR REPLACE) so the FTS update trigger fires
+        const statement = env.DB.prepare(
+          `INSERT INTO articles (id, title, content, tags, author, published_at, published_ts, created_at, updated_at, index_status)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(id) DO UPDATE SET
+             title = excluded.title,
+             content = excluded.content,
+             tags = excluded.tags,
+             author = excluded.author,
+             published_at = excluded.published_at,
+             published_ts = excluded.published_ts,
+             created_at = excluded.created_at,
+             updated_at = excluded.updated_at,
+             index_status = excluded.index_status`
+        );
+
+        const statements = articles.map((article) =>
+          statement.bind(
+            parseInt(article.id),
+            article.title,
+            article.content,
+            article.tags ? JSON.stringify(Array.isArray(article.tags) ? article.tags : [article.tags]) : null,
+            article.author || null,
+            article.published_at || null,
+            article.published_ts ?? toTimestamp(article.published_at),
+            article.created_at || now,
+            article.updated_at || now,
+            // Vectors are restored separately, so only articles sent as pending get embedded
+            article.index_status === INDEX_PENDING ? INDEX_PENDING : INDEX_INDEXED
+          )
+        );
+        await env.DB.batch(statements);
+
+        return new Response(JSON.stringify({ written: statements.length }), {
+          headers: { ...corsHeaders, "Content-Type": "application/json" },
+        });
+      }
+
       // GET - List all articles
       if (method === "GET") {
         const result = await env.DB.prepare(
@@ -68,11 +227,11 @@ export default {
 
         // Insert article into D1
         const result = await env.DB.prepare(
-          `INSERT INTO articles (title, content, tags, author, published_at, created_at, updated_at)
-           VALUES (?, ?, ?, ?, ?, ?, ?)
+          `INSERT INTO articles (title, content, tags, author, published_at, published_ts, created_at, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)
            RETURNING *`
         )
-          .bind(title, content, tagsStr, author || null, publishedDate, now, now)
+          .bind(title, content, tagsStr, author || null, publishedDate, toTimestamp(publishedDate), now, now)
           .first();
 
         if (!result) {
@@ -91,38 +250,9 @@ export default {
           tags: result.tags ? (typeof result.tags === 'string' ? JSON.parse(result.tags) : result.tags) : [],
         };
 
-        // Generate embedding for the new article
+        // Embed after responding; the cron sweep retries anything left pending or failed
         if (env.AI && env.VECTORIZE) {
-          try {
-            const embedUrl = new URL(request.url);
-            embedUrl.pathname = "/embed";
-            
-            // Call embed API internally or generate embedding directly
-            const embeddingResponse = await env.AI.run("@cf/baai/bge-base-en-v1.5", {
-              text: [content],
-            });
-
-            if (embeddingResponse && embeddingResponse.data && embeddingResponse.data.length > 0) {
-              const embedding = embeddingResponse.data[0];
-              const vectorId = `article_${newArticle.id}`;
-              
-              await env.VECTORIZE.insert([
-                {
-                  id: vectorId,
-                  values: embedding,
-                  metadata: {
-                    article_id: newArticle.id,
-                    title: newArticle.title,
-                    tags: newArticle.tags,
-                    published_at: newArticle.published_at,
-                  },
-                },
-              ]);
-            }
-          } catch (embedError) {
-            console.error("Error generating embedding for new article:", embedError);
-            // Continue even if embedding fails - article is still created
-          }
+          ctx.waitUntil(indexArticles(env, [newArticle]));
         }
 
         return new Response(JSON.stringify(newArticle), {
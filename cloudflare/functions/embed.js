@@ -1,8 +1,85 @@
 // Generate embedding API
 // Uses Cloudflare Workers AI to generate embeddings and stores them in Vectorize
+// Batch mode ({ items: [...] }) embeds many articles in one AI call; each item may carry
+// several chunks of one article, whose vectors are pooled back into a single article vector.
+
+import { buildVectorMetadata, vectorIdFor } from "./vectorize.js";
+import { currentVersions, markIndexed } from "./indexing.js";
+
+// Workers AI accepts at most 100 texts per bge-base-en-v1.5 call
+const MAX_TEXTS_PER_CALL = 100;
+
+// Length-weighted mean of chunk vectors, L2-normalized for cosine similarity
+function poolVectors(vectors, weights) {
+  const pooled = new Array(vectors[0].length).fill(0);
+  let totalWeight = 0;
+  vectors.forEach((vector, i) => {
+    const weight = weights ? weights[i] : 1;
+    totalWeight += weight;
+    for (let d = 0; d < vector.length; d++) pooled[d] += vector[d] * weight;
+  });
+
+  let norm = 0;
+  for (let d = 0; d < pooled.length; d++) {
+    pooled[d] /= totalWeight || 1;
+    norm += pooled[d] * pooled[d];
+  }
+  norm = Math.sqrt(norm) || 1;
+  return pooled.map((v) => v / norm);
+}
+
+// Items that name the article version (updated_at) they were embedded from and whose
+// article has since been edited or deleted. Writing their vectors could overwrite the
+// newer version's, so they are skipped; items without updated_at can't be checked.
+async function staleItems(env, items) {
+  const versioned = items.filter((item) => item.updated_at);
+  if (!env.DB || versioned.length === 0) return new Set();
+  const current = await currentVersions(env, versioned.map((item) => parseInt(item.article_id)));
+  return new Set(
+    versioned
+      .filter((item) => current.get(parseInt(item.article_id)) !== item.updated_at)
+      .map((item) => item.article_id)
+  );
+}
+
+// Embed a packed batch: items = [{ article_id, texts: [chunk, ...], title, tags, published_at, author, updated_at }]
+async function embedBatch(env, items) {
+  const texts = items.flatMap((item) => item.texts);
+  if (texts.length > MAX_TEXTS_PER_CALL) {
+    throw new Error(`At most ${MAX_TEXTS_PER_CALL} texts per batch, got ${texts.length}`);
+  }
+
+  const embeddingResponse = await env.AI.run("@cf/baai/bge-base-en-v1.5", { text: texts });
+  if (!embeddingResponse || !embeddingResponse.data || embeddingResponse.data.length !== texts.length) {
+    throw new Error("Failed to generate embeddings for batch");
+  }
+
+  const stale = await staleItems(env, items);
+  const written = [];
+  const vectors = [];
+  let offset = 0;
+  for (const item of items) {
+    const chunkVectors = embeddingResponse.data.slice(offset, offset + item.texts.length);
+    offset += item.texts.length;
+    if (stale.has(item.article_id)) continue;
+    written.push(item);
+    vectors.push({
+      id: vectorIdFor(item.article_id),
+      values: poolVectors(chunkVectors, item.texts.map((t) => t.length)),
+      metadata: buildVectorMetadata({ ...item, id: item.article_id }),
+    });
+  }
+
+  // upsert so re-embedding an article replaces its previous vector
+  if (vectors.length > 0) {
+    await env.VECTORIZE.upsert(vectors);
+  }
+
+  return { articles: written, stale: [...stale], texts: texts.length };
+}
 
 export default {
-  async fetch(request, env) {
+  async fetch(request, env, ctx) {
     const { method } = request;
 
     // CORS headers
@@ -19,7 +96,40 @@ export default {
     try {
       if (method === "POST") {
         const body = await request.json();
-        const { text, article_id, title, tags, published_at } = body;
+        const { text, article_id, title, tags, published_at, author, updated_at } = body;
+
+        if (Array.isArray(body.items)) {
+          const items = body.items.filter(
+            (item) => item.article_id && Array.isArray(item.texts) && item.texts.length > 0
+          );
+          if (items.length === 0) {
+            return new Response(JSON.stringify({ error: "items must contain article_id and texts" }), {
+              status: 400,
+              headers: { ...corsHeaders, "Content-Type": "application/json" },
+            });
+          }
+          if (!env.AI || !env.VECTORIZE) {
+            return new Response(
+              JSON.stringify({ error: "AI or Vectorize binding not configured" }),
+              {
+                status: 500,
+                headers: { ...corsHeaders, "Content-Type": "application/json" },
+              }
+            );
+          }
+
+          const result = await embedBatch(env, items);
+          ctx.waitUntil(
+            markIndexed(env, result.articles.map((item) => ({ id: item.article_id, updated_at: item.updated_at })))
+          );
+          const articleIds = result.articles.map((item) => item.article_id);
+          return new Response(
+            JSON.stringify({ embedded: articleIds.length, articles: articleIds, stale: result.stale, texts: result.texts }),
+            {
+              headers: { ...corsHeaders, "Content-Type": "application/json" },
+            }
+          );
+        }
 
         if (!text) {
           return new Response(JSON.stringify({ error: "Text is required" }), {
@@ -56,25 +166,29 @@ export default {
 
         const embedding = embeddingResponse.data[0];
 
-        // Store embedding in Vectorize if article_id is provided
-        if (article_id && env.VECTORIZE) {
+        // Store embedding in Vectorize if article_id is provided and the text isn't outdated
+        const stale = Boolean(article_id && env.VECTORIZE) &&
+          (await staleItems(env, [{ article_id, updated_at }])).size > 0;
+        if (article_id && env.VECTORIZE && !stale) {
           try {
-            const vectorId = `article_${article_id}`;
-            const metadata = {
-              article_id: parseInt(article_id),
-              title: title || "",
-              tags: tags || [],
-              published_at: published_at || new Date().toISOString(),
-            };
-
-            // Insert or upsert the vector
-            await env.VECTORIZE.insert([
+            const vectorId = vectorIdFor(article_id);
+            const metadata = buildVectorMetadata({
+              id: article_id,
+              title,
+              tags,
+              published_at,
+              author,
+            });
+
+            // Upsert so re-embedding an article replaces its previous vector
+            await env.VECTORIZE.upsert([
               {
                 id: vectorId,
                 values: embedding,
                 metadata: metadata,
               },
             ]);
+            ctx.waitUntil(markIndexed(env, [{ id: article_id, updated_at }]));
           } catch (vectorError) {
             console.error("Error storing embedding in Vectorize:", vectorError);
             // Continue even if Vectorize storage fails - return the embedding anyway
@@ -86,6 +200,7 @@ export default {
             embedding: embedding,
             article_id: article_id || null,
             dimensions: embedding.length,
+            stale,
           }),
           {
             headers: { ...corsHeaders, "Content-Type": "application/json" },
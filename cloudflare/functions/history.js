@@ -1,8 +1,78 @@
 // Generate history API
 // Retrieves relevant articles via vector search, then uses Llama to generate summary and timeline
+// Generated results are cached in D1 (history_cache) keyed by the normalized query and the
+// contributing articles, so a cache hit skips the D1 content fetch and the Llama call.
+// Accepts the same filters as /search (tags, author, published_after, published_before).
+
+import { parseFilters, queryVectors, buildD1FilterClause } from "./vectorize.js";
+
+// Cached entries older than this are regenerated (override with HISTORY_CACHE_TTL_SECONDS)
+const DEFAULT_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60;
+
+function cacheTtlSeconds(env) {
+  return parseInt(env.HISTORY_CACHE_TTL_SECONDS) || DEFAULT_CACHE_TTL_SECONDS;
+}
+
+// Lowercase and collapse whitespace so trivially different queries share a cache entry
+function normalizeQuery(query) {
+  return String(query).toLowerCase().replace(/\s+/g, " ").trim();
+}
+
+// Key = SHA-256 of the normalized query plus every contributing article's id and updated_at.
+// A new article entering the top results, or an edit to one of them, changes the key.
+async function buildCacheKey(normalizedQuery, articleVersions) {
+  const versions = [...articleVersions]
+    .sort((a, b) => a.id - b.id)
+    .map((a) => `${a.id}:${a.updated_at || ""}`)
+    .join(",");
+  const data = new TextEncoder().encode(`${normalizedQuery}|${versions}`);
+  const digest = await crypto.subtle.digest("SHA-256", data);
+  return [...new Uint8Array(digest)].map((b) => b.toString(16).padStart(2, "0")).join("");
+}
+
+async function readCachedHistory(env, cacheKey) {
+  try {
+    const ttl = cacheTtlSeconds(env);
+    const row = await env.DB.prepare(
+      `SELECT response FROM history_cache
+       WHERE cache_key = ? AND created_at > datetime('now', ?)`
+    )
+      .bind(cacheKey, `-${ttl} seconds`)
+      .first();
+    return row ? JSON.parse(row.response) : null;
+  } catch (cacheError) {
+    // A missing cache table should never break history generation
+    console.error("Error reading history cache:", cacheError);
+    return null;
+  }
+}
+
+async function writeCachedHistory(env, cacheKey, normalizedQuery, articleIds, payload) {
+  try {
+    await env.DB.prepare(
+      `INSERT OR REPLACE INTO history_cache (cache_key, query, article_ids, response, created_at)
+       VALUES (?, ?, ?, ?, datetime('now'))`
+    )
+      .bind(cacheKey, normalizedQuery, JSON.stringify(articleIds), JSON.stringify(payload))
+      .run();
+  } catch (cacheError) {
+    console.error("Error writing history cache:", cacheError);
+  }
+}
+
+// Delete expired entries (run from the cron trigger). Edits and new articles create new
+// keys rather than overwriting old ones, so without this the table only ever grows.
+export async function purgeExpiredHistory(env) {
+  const result = await env.DB.prepare(
+    "DELETE FROM history_cache WHERE created_at < datetime('now', ?)"
+  )
+    .bind(`-${cacheTtlSeconds(env)} seconds`)
+    .run();
+  return result.meta ? result.meta.changes : 0;
+}
 
 export default {
-  async fetch(request, env) {
+  async fetch(request, env, ctx) {
     const { method } = request;
 
     // CORS headers
@@ -19,7 +89,8 @@ export default {
     try {
       if (method === "POST") {
         const body = await request.json();
-        const { query, article_id } = body;
+        const { query, article_id, refresh = false } = body;
+        const filters = parseFilters(body);
 
         if (!query) {
           return new Response(JSON.stringify({ error: "Query is required" }), {
@@ -56,13 +127,7 @@ export default {
         const queryEmbedding = embeddingResponse.data[0];
 
         // 2. Query Vectorize to find relevant articles (get top 20, then filter by relevance)
-        const vectorResults = await env.VECTORIZE.query(queryEmbedding, {
-          topK: 20,
-          returnValues: false,
-          returnMetadata: true,
-        });
-
-        const matches = vectorResults.matches || [];
+        const matches = await queryVectors(env, queryEmbedding, 20, filters);
         
         // Filter by relevance score - only keep articles with similarity > 0.6
         const relevantMatches = matches.filter(match => match.score > 0.6);
@@ -84,14 +149,27 @@ export default {
 
         // 3. Retrieve full article content from D1
         // Use filtered matches and sort by relevance score
-        const articleIds = relevantMatches
+        let articleIds = relevantMatches
           .sort((a, b) => b.score - a.score)
-          .slice(0, 10) // Take top 10 most relevant
-          .map((result) => result.metadata?.article_id)
+          .map((result) => result.article_id)
           .filter((id) => id !== undefined && id !== null);
+
+        // Tag predicates can't be pushed into Vectorize - narrow the candidates in D1 first
+        const d1Filter = buildD1FilterClause(filters);
+        if (d1Filter.sql && articleIds.length > 0) {
+          const candidatePlaceholders = articleIds.map(() => "?").join(",");
+          const filteredResult = await env.DB.prepare(
+            `SELECT id FROM articles WHERE id IN (${candidatePlaceholders})${d1Filter.sql}`
+          )
+            .bind(...articleIds, ...d1Filter.params)
+            .all();
+          const allowed = new Set((filteredResult.results || []).map((row) => row.id));
+          articleIds = articleIds.filter((id) => allowed.has(id));
+        }
+        articleIds = articleIds.slice(0, 10); // Take top 10 most relevant
         
         // Store scores for later use
-        const scoreMap = new Map(relevantMatches.map(m => [m.metadata?.article_id, m.score]));
+        const scoreMap = new Map(relevantMatches.map(m => [m.article_id, m.score]));
 
         if (articleIds.length === 0) {
           return new Response(
@@ -107,6 +185,25 @@ export default {
         }
 
         const placeholders = articleIds.map(() => "?").join(",");
+
+        // Check the cache using only ids and versions of the contributing articles
+        const normalizedQuery = normalizeQuery(query);
+        const versionsResult = await env.DB.prepare(
+          `SELECT id, updated_at FROM articles WHERE id IN (${placeholders})`
+        )
+          .bind(...articleIds)
+          .all();
+        const cacheKey = await buildCacheKey(normalizedQuery, versionsResult.results || []);
+
+        if (!refresh) {
+          const cached = await readCachedHistory(env, cacheKey);
+          if (cached) {
+            return new Response(JSON.stringify(cached), {
+              headers: { ...corsHeaders, "Content-Type": "application/json", "X-History-Cache": "HIT" },
+            });
+          }
+        }
+
         const articlesResult = await env.DB.prepare(
           `SELECT * FROM articles WHERE id IN (${placeholders}) ORDER BY published_at ASC`
         )
@@ -235,16 +332,29 @@ Historical Summary:`;
           };
         });
 
-        return new Response(
-          JSON.stringify({
-            summary: summary,
-            timeline: timeline,
-            sources: sources,
-          }),
-          {
-            headers: { ...corsHeaders, "Content-Type": "application/json" },
-          }
+        const payload = {
+          summary: summary,
+          timeline: timeline,
+          sources: sources,
+        };
+
+        // Store without delaying the response when the runtime allows it
+        const cacheWrite = writeCachedHistory(
+          env,
+          cacheKey,
+          normalizedQuery,
+          articles.map((a) => a.id),
+          payload
         );
+        if (ctx && ctx.waitUntil) {
+          ctx.waitUntil(cacheWrite);
+        } else {
+          await cacheWrite;
+        }
+
+        return new Response(JSON.stringify(payload), {
+          headers: { ...corsHeaders, "Content-Type": "application/json", "X-History-Cache": "MISS" },
+        });
       }
 
       return new Response("Method not allowed", { status: 405, headers: corsHeaders });
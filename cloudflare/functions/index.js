@@ -5,8 +5,9 @@ import articlesHandler from './articles.js';
 import articleByIdHandler from './articles-[id].js';
 import embedHandler from './embed.js';
 import searchHandler from './search.js';
-import historyHandler from './history.js';
+import historyHandler, { purgeExpiredHistory } from './history.js';
 import vectorizeHandler from './vectorize.js';
+import { indexPendingArticles } from './indexing.js';
 
 export default {
   async fetch(request, env, ctx) {
@@ -28,12 +29,14 @@ export default {
     try {
       // Route to appropriate handler
       // Articles list/create
-      if (path === '/articles' || path === '/api/articles') {
+      if (path === '/articles' || path === '/api/articles' ||
+          path === '/articles/bulk' || path === '/api/articles/bulk' ||
+          path === '/articles/index-status' || path === '/api/articles/index-status') {
         return articlesHandler.fetch(request, env, ctx);
       }
       
-      // Article by ID
-      if (path.match(/^\/(?:api\/)?articles\/\d+$/)) {
+      // Article by ID (and its indexing state)
+      if (path.match(/^\/(?:api\/)?articles\/\d+(?:\/index-status)?$/)) {
         return articleByIdHandler.fetch(request, env, ctx);
       }
       
@@ -66,6 +69,7 @@ export default {
           endpoints: {
             articles: '/articles',
             article: '/articles/:id',
+            indexStatus: '/articles/:id/index-status',
             embed: '/embed',
             search: '/search',
             history: '/history',
@@ -96,4 +100,21 @@ export default {
       });
     }
   },
+
+  // Cron trigger: embed articles still pending (or failed) after their background indexing,
+  // and drop expired /history cache entries
+  async scheduled(event, env, ctx) {
+    if (!env.DB) return;
+    ctx.waitUntil(
+      purgeExpiredHistory(env).then((deleted) => {
+        console.log(`History cache purge: ${deleted} expired entries deleted`);
+      })
+    );
+    if (!env.AI || !env.VECTORIZE) return;
+    ctx.waitUntil(
+      indexPendingArticles(env).then((totals) => {
+        console.log(`Index sweep: ${totals.indexed} indexed, ${totals.failed} failed`);
+      })
+    );
+  },
 };
@@ -0,0 +1,127 @@
+// Asynchronous vector indexing for articles
+// Writes return as soon as D1 commits with index_status = 'pending'; the embedding runs
+// afterwards (ctx.waitUntil), and the cron trigger sweeps up anything still pending or failed,
+// embedding many articles per Workers AI call.
+
+import { buildVectorMetadata, vectorIdFor } from "./vectorize.js";
+
+export const INDEX_PENDING = "pending";
+export const INDEX_INDEXED = "indexed";
+export const INDEX_FAILED = "failed";
+
+// Texts per bge-base-en-v1.5 call when sweeping (Workers AI accepts at most 100)
+const INDEX_BATCH_SIZE = 50;
+// Articles indexed per cron run
+const MAX_ARTICLES_PER_SWEEP = 500;
+// Failed articles are retried by the sweep until they reach this many attempts
+const MAX_INDEX_ATTEMPTS = 5;
+// Leave freshly written articles to their own waitUntil before the sweep picks them up
+const INDEX_GRACE_SECONDS = 60;
+
+// Current updated_at of each article id (at most 100 ids); deleted articles are absent
+export async function currentVersions(env, articleIds) {
+  if (articleIds.length === 0) return new Map();
+  const placeholders = articleIds.map(() => "?").join(", ");
+  const result = await env.DB.prepare(
+    `SELECT id, updated_at FROM articles WHERE id IN (${placeholders})`
+  )
+    .bind(...articleIds)
+    .all();
+  return new Map((result.results || []).map((row) => [row.id, row.updated_at]));
+}
+
+// Embed articles with one multi-text AI call and upsert their vectors.
+// Articles edited or deleted since they were read are skipped right before the upsert (the
+// edit queued its own job, whose vector this one must not overwrite), and status is only
+// marked indexed if the row is still at the version that was embedded.
+export async function indexArticles(env, articles) {
+  if (articles.length === 0) return { indexed: 0, failed: 0 };
+
+  try {
+    const embeddingResponse = await env.AI.run("@cf/baai/bge-base-en-v1.5", {
+      text: articles.map((article) => article.content),
+    });
+    if (!embeddingResponse || !embeddingResponse.data || embeddingResponse.data.length !== articles.length) {
+      throw new Error("Failed to generate embeddings for batch");
+    }
+
+    const versions = await currentVersions(env, articles.map((article) => article.id));
+    const current = [];
+    const vectors = [];
+    articles.forEach((article, i) => {
+      if (versions.get(article.id) !== article.updated_at) return;
+      current.push(article);
+      vectors.push({
+        id: vectorIdFor(article.id),
+        values: embeddingResponse.data[i],
+        metadata: buildVectorMetadata(article),
+      });
+    });
+    if (vectors.length === 0) return { indexed: 0, failed: 0 };
+
+    await env.VECTORIZE.upsert(vectors);
+
+    const now = new Date().toISOString();
+    const statement = env.DB.prepare(
+      `UPDATE articles SET index_status = ?, index_attempts = index_attempts + 1, indexed_at = ?
+       WHERE id = ? AND updated_at = ?`
+    );
+    await env.DB.batch(
+      current.map((article) => statement.bind(INDEX_INDEXED, now, article.id, article.updated_at))
+    );
+    return { indexed: current.length, failed: 0 };
+  } catch (error) {
+    console.error(`Error indexing ${articles.length} articles:`, error);
+    const statement = env.DB.prepare(
+      `UPDATE articles SET index_status = ?, index_attempts = index_attempts + 1
+       WHERE id = ? AND updated_at = ?`
+    );
+    await env.DB.batch(
+      articles.map((article) => statement.bind(INDEX_FAILED, article.id, article.updated_at))
+    );
+    return { indexed: 0, failed: articles.length };
+  }
+}
+
+// Mark articles indexed after their vectors were written elsewhere (e.g. POST /embed).
+// versions = [{ id, updated_at }] of the content that was embedded; a row edited since
+// keeps its pending status, and without updated_at nothing is marked.
+export async function markIndexed(env, versions) {
+  const known = versions.filter((version) => version.updated_at);
+  if (!env.DB || known.length === 0) return;
+  const now = new Date().toISOString();
+  const statement = env.DB.prepare(
+    "UPDATE articles SET index_status = ?, indexed_at = ? WHERE id = ? AND updated_at = ?"
+  );
+  await env.DB.batch(
+    known.map((version) => statement.bind(INDEX_INDEXED, now, parseInt(version.id), version.updated_at))
+  );
+}
+
+// Index pending and retryable failed articles in multi-text batches (cron trigger)
+export async function indexPendingArticles(env, limit = MAX_ARTICLES_PER_SWEEP) {
+  // updated_at is ISO 8601 when written by the API but 'YYYY-MM-DD HH:MM:SS' from the schema
+  // default, so both sides go through datetime() rather than comparing raw strings
+  const result = await env.DB.prepare(
+    `SELECT * FROM articles
+     WHERE (index_status = ? OR (index_status = ? AND index_attempts < ?))
+       AND datetime(updated_at) <= datetime('now', ?)
+     ORDER BY datetime(updated_at)
+     LIMIT ?`
+  )
+    .bind(INDEX_PENDING, INDEX_FAILED, MAX_INDEX_ATTEMPTS, `-${INDEX_GRACE_SECONDS} seconds`, limit)
+    .all();
+
+  const articles = (result.results || []).map((article) => ({
+    ...article,
+    tags: article.tags ? (typeof article.tags === 'string' ? JSON.parse(article.tags) : article.tags) : [],
+  }));
+
+  const totals = { indexed: 0, failed: 0 };
+  for (let i = 0; i < articles.length; i += INDEX_BATCH_SIZE) {
+    const outcome = await indexArticles(env, articles.slice(i, i + INDEX_BATCH_SIZE));
+    totals.indexed += outcome.indexed;
+    totals.failed += outcome.failed;
+  }
+  return totals;
+}
@@ -0,0 +1,75 @@
+// Keyword search utilities
+// BM25 search over the articles_fts FTS5 table and reciprocal rank fusion with vector results.
+
+import { buildD1FilterClause } from "./vectorize.js";
+
+// Column weights for bm25(): title, content, tags. Names in titles/tags matter most.
+const BM25_WEIGHTS = [10.0, 1.0, 5.0];
+
+// Standard RRF damping constant
+const RRF_K = 60;
+
+// Turn free text into a safe FTS5 MATCH expression: every token is quoted (so operators
+// and punctuation in user input can't break the query) and tokens are OR-ed together.
+// BM25 still ranks documents containing all tokens first.
+export function buildFtsQuery(query) {
+  const tokens = String(query)
+    .toLowerCase()
+    .split(/[^\p{L}\p{N}]+/u)
+    .filter((t) => t.length > 0);
+  if (tokens.length === 0) return null;
+  return tokens.map((t) => `"${t}"`).join(" OR ");
+}
+
+// Run a BM25 keyword search. Returns full article rows, best first, with `bm25`
+// (lower is better, as reported by SQLite).
+export async function lexicalSearch(env, query, limit, filters = {}) {
+  const ftsQuery = buildFtsQuery(query);
+  if (!ftsQuery) return [];
+
+  const d1Filter = buildD1FilterClause(filters);
+  const result = await env.DB.prepare(
+    `SELECT articles.*, bm25(articles_fts, ${BM25_WEIGHTS.join(", ")}) AS bm25
+     FROM articles_fts
+     JOIN articles ON articles.id = articles_fts.rowid
+     WHERE articles_fts MATCH ?${d1Filter.sql}
+     ORDER BY bm25
+     LIMIT ?`
+  )
+    .bind(ftsQuery, ...d1Filter.params, limit)
+    .all();
+
+  return result.results || [];
+}
+
+// True when the query names one of the article's tags exactly (e.g. a company name)
+export function isExactTagMatch(query, article) {
+  const needle = String(query).toLowerCase().trim();
+  const tags = article.tags
+    ? typeof article.tags === "string"
+      ? JSON.parse(article.tags)
+      : article.tags
+    : [];
+  return tags.some((tag) => String(tag).toLowerCase() === needle);
+}
+
+// Reciprocal rank fusion over ranked lists of article ids.
+// Returns [{ id, score, ranks: [rank in list 0 or null, ...] }] sorted by fused score.
+export function reciprocalRankFusion(rankedLists, k = RRF_K) {
+  const fused = new Map();
+
+  rankedLists.forEach((ids, listIndex) => {
+    ids.forEach((id, rank) => {
+      if (!fused.has(id)) {
+        fused.set(id, { id, score: 0, ranks: rankedLists.map(() => null) });
+      }
+      const entry = fused.get(id);
+      // Ignore duplicates within one list; keep the best rank
+      if (entry.ranks[listIndex] !== null) return;
+      entry.ranks[listIndex] = rank + 1;
+      entry.score += 1 / (k + rank + 1);
+    });
+  });
+
+  return [...fused.values()].sort((a, b) => b.score - a.score);
+}
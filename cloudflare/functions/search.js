@@ -1,5 +1,87 @@
 // Vector search API
 // Generates embedding for query, searches Vectorize, returns top articles from D1
+// Optional filters (tags, author, published_after, published_before) are pushed down
+// into Vectorize metadata where indexed and finished in D1 otherwise.
+// `mode` selects vector, lexical (FTS5/BM25), hybrid (RRF fusion) or auto retrieval.
+
+import { parseFilters, queryVectors, buildD1FilterClause } from "./vectorize.js";
+import { lexicalSearch, isExactTagMatch, reciprocalRankFusion } from "./lexical.js";
+
+// vector  - embedding + Vectorize (default)
+// lexical - BM25 over the FTS5 index only, never calls Workers AI
+// hybrid  - both, fused with reciprocal rank fusion
+// auto    - lexical when the query exactly names a tag, otherwise hybrid
+const SEARCH_MODES = ["vector", "lexical", "hybrid", "auto"];
+
+// Shape an article row into a search result
+function formatResult(article, score, extra = {}) {
+  // Parse tags
+  const tags = article.tags
+    ? typeof article.tags === "string"
+      ? JSON.parse(article.tags)
+      : article.tags
+    : [];
+
+  return {
+    id: article.id,
+    title: article.title,
+    content: article.content.substring(0, 200) + "...", // Snippet
+    author: article.author,
+    published_at: article.published_at,
+    tags: tags,
+    score: score,
+    link: `/articles/${article.id}`,
+    ...extra,
+  };
+}
+
+// Embed the query, search Vectorize and load matching articles from D1.
+// Returns [{ article, score }] ordered by similarity.
+async function vectorCandidates(env, query, topK, filters) {
+  // 1. Generate embedding for query using Workers AI
+  const embeddingResponse = await env.AI.run("@cf/baai/bge-base-en-v1.5", {
+    text: [query],
+  });
+
+  if (!embeddingResponse || !embeddingResponse.data || embeddingResponse.data.length === 0) {
+    throw new Error("Failed to generate query embedding");
+  }
+
+  const queryEmbedding = embeddingResponse.data[0];
+
+  // 2. Query Vectorize for similar articles (metadata filters applied inside Vectorize)
+  const matches = await queryVectors(env, queryEmbedding, topK, filters);
+
+  // Filter by relevance score - only return articles with similarity > 0.6
+  // (topK is applied by the caller, after the D1 lookup may drop candidates failing tag filters)
+  const relevantMatches = matches.filter((match) => match.score > 0.6);
+
+  console.log(`Search: ${matches.length} total, ${relevantMatches.length} relevant (score > 0.6)`);
+
+  // 3. Retrieve full article details from D1 (using filtered matches)
+  const articleIds = relevantMatches
+    .map((result) => result.article_id)
+    .filter((id) => id !== undefined && id !== null);
+
+  if (articleIds.length === 0) return [];
+
+  // Fetch articles from D1, applying any predicates Vectorize could not evaluate
+  const placeholders = articleIds.map(() => "?").join(",");
+  const d1Filter = buildD1FilterClause(filters);
+  const articlesResult = await env.DB.prepare(
+    `SELECT * FROM articles WHERE id IN (${placeholders})${d1Filter.sql}`
+  )
+    .bind(...articleIds, ...d1Filter.params)
+    .all();
+
+  const articlesById = new Map((articlesResult.results || []).map((a) => [a.id, a]));
+
+  // 4. Combine vector results with article data, maintaining relevance order
+  return relevantMatches
+    .map((match) => ({ article: articlesById.get(match.article_id), score: match.score }))
+    .filter(({ article }) => article !== undefined)
+    .sort((a, b) => b.score - a.score); // Sort by relevance score
+}
 
 export default {
   async fetch(request, env) {
@@ -19,7 +101,8 @@ export default {
     try {
       if (method === "POST") {
         const body = await request.json();
-        const { query, topK = 10 } = body;
+        const { query, topK = 10, mode = "vector" } = body;
+        const filters = parseFilters(body);
 
         if (!query) {
           return new Response(JSON.stringify({ error: "Query is required" }), {
@@ -28,24 +111,20 @@ export default {
           });
         }
 
-        if (!env.AI || !env.VECTORIZE || !env.DB) {
+        if (!SEARCH_MODES.includes(mode)) {
           return new Response(
-            JSON.stringify({ error: "AI, Vectorize, or Database not configured" }),
+            JSON.stringify({ error: `mode must be one of: ${SEARCH_MODES.join(", ")}` }),
             {
-              status: 500,
+              status: 400,
               headers: { ...corsHeaders, "Content-Type": "application/json" },
             }
           );
         }
 
-        // 1. Generate embedding for query using Workers AI
-        const embeddingResponse = await env.AI.run("@cf/baai/bge-base-en-v1.5", {
-          text: [query],
-        });
-
-        if (!embeddingResponse || !embeddingResponse.data || embeddingResponse.data.length === 0) {
+        const needsVectors = mode === "vector" || mode === "hybrid" || mode === "auto";
+        if (!env.DB || (needsVectors && (!env.AI || !env.VECTORIZE))) {
           return new Response(
-            JSON.stringify({ error: "Failed to generate query embedding" }),
+            JSON.stringify({ error: "AI, Vectorize, or Database not configured" }),
             {
               status: 500,
               headers: { ...corsHeaders, "Content-Type": "application/json" },
@@ -53,105 +132,72 @@ export default {
           );
         }
 
-        const queryEmbedding = embeddingResponse.data[0];
-
-        // 2. Query Vectorize for similar articles
-        const vectorResults = await env.VECTORIZE.query(queryEmbedding, {
-          topK: Math.min(topK * 2, 40), // Get more candidates for filtering
-          returnValues: false,
-          returnMetadata: true,
-        });
-
-        // Vectorize returns an object with matches array
-        const matches = vectorResults.matches || [];
-        
-        // Filter by relevance score - only return articles with similarity > 0.6
-        const relevantMatches = matches
-          .filter(match => match.score > 0.6)
-          .slice(0, topK); // Limit to requested topK after filtering
-        
-        console.log(`Search: ${matches.length} total, ${relevantMatches.length} relevant (score > 0.6)`);
-
-        if (relevantMatches.length === 0) {
-          return new Response(
+        const respond = (results, servedBy) =>
+          new Response(
             JSON.stringify({
               query,
-              results: [],
-              count: 0,
+              mode: servedBy,
+              filters,
+              results: results,
+              count: results.length,
             }),
             {
               headers: { ...corsHeaders, "Content-Type": "application/json" },
             }
           );
+
+        // Lexical-only: BM25 over the FTS index, no Workers AI call
+        if (mode === "lexical") {
+          const rows = await lexicalSearch(env, query, topK, filters);
+          return respond(rows.map((row) => formatResult(row, -row.bm25)), "lexical");
         }
 
-        // 3. Retrieve full article details from D1 (using filtered matches)
-        const articleIds = relevantMatches
-          .map((result) => result.metadata?.article_id)
-          .filter((id) => id !== undefined && id !== null);
+        // Auto: exact-name queries (the query equals a tag such as a company name) are
+        // answered from the keyword index alone; anything else falls through to hybrid
+        let lexicalRows = null;
+        if (mode === "auto") {
+          lexicalRows = await lexicalSearch(env, query, topK * 2, filters);
+          if (lexicalRows.length > 0 && isExactTagMatch(query, lexicalRows[0])) {
+            const exact = lexicalRows.filter((row) => isExactTagMatch(query, row)).slice(0, topK);
+            console.log(`Search: lexical fast path, ${exact.length} exact tag matches`);
+            return respond(exact.map((row) => formatResult(row, -row.bm25)), "lexical");
+          }
+        }
 
-        if (articleIds.length === 0) {
-          return new Response(
-            JSON.stringify({
-              query,
-              results: [],
-              count: 0,
-            }),
-            {
-              headers: { ...corsHeaders, "Content-Type": "application/json" },
-            }
+        if (mode === "vector") {
+          const candidates = await vectorCandidates(env, query, topK, filters);
+          return respond(
+            candidates.slice(0, topK).map(({ article, score }) => formatResult(article, score)),
+            "vector"
           );
         }
 
-        // Fetch articles from D1
-        const placeholders = articleIds.map(() => "?").join(",");
-        const articlesResult = await env.DB.prepare(
-          `SELECT * FROM articles WHERE id IN (${placeholders})`
-        )
-          .bind(...articleIds)
-          .all();
-
-        const articles = articlesResult.results || [];
-
-        // 4. Combine vector results with article data, maintaining relevance order
-        const results = relevantMatches
-          .map((vectorResult) => {
-            const articleId = vectorResult.metadata?.article_id;
-            const article = articles.find((a) => a.id === articleId);
-
-            if (!article) return null;
-
-            // Parse tags
-            const tags = article.tags
-              ? typeof article.tags === "string"
-                ? JSON.parse(article.tags)
-                : article.tags
-              : [];
-
-            return {
-              id: article.id,
-              title: article.title,
-              content: article.content.substring(0, 200) + "...", // Snippet
-              author: article.author,
-              published_at: article.published_at,
-              tags: tags,
-              score: vectorResult.score,
-              link: `/articles/${article.id}`,
-            };
+        // Hybrid: run both retrievers concurrently and fuse their rankings with RRF
+        const [vectorResults, lexicalResults] = await Promise.all([
+          vectorCandidates(env, query, topK * 2, filters),
+          lexicalRows ? Promise.resolve(lexicalRows) : lexicalSearch(env, query, topK * 2, filters),
+        ]);
+
+        const articlesById = new Map();
+        lexicalResults.forEach((row) => articlesById.set(row.id, row));
+        vectorResults.forEach(({ article }) => articlesById.set(article.id, article));
+
+        const fused = reciprocalRankFusion([
+          vectorResults.map(({ article }) => article.id),
+          lexicalResults.map((row) => row.id),
+        ]);
+
+        console.log(
+          `Search: hybrid, ${vectorResults.length} vector + ${lexicalResults.length} lexical -> ${fused.length} fused`
+        );
+
+        const results = fused.slice(0, topK).map(({ id, score, ranks }) =>
+          formatResult(articlesById.get(id), score, {
+            vector_rank: ranks[0],
+            lexical_rank: ranks[1],
           })
-          .filter((result) => result !== null)
-          .sort((a, b) => (b?.score || 0) - (a?.score || 0)); // Sort by relevance score
-
-        return new Response(
-          JSON.stringify({
-            query,
-            results: results,
-            count: results.length,
-          }),
-          {
-            headers: { ...corsHeaders, "Content-Type": "application/json" },
-          }
         );
+        return respond(results, "hybrid");
       }
 
       return new Response("Method not allowed", { status: 405, headers: corsHeaders });
@@ -1,5 +1,301 @@
-// Vector search utility placeholder
-// This will contain helper functions for vector similarity search operations
+// Vector search utilities
+// Shared helpers for Vectorize metadata and filtered similarity search, plus the
+// /vectorize maintenance endpoint used by the D1 <-> Vectorize reconciler.
+//
+// Filterable metadata (create the indexes once, see README):
+//   published_ts - number, Unix seconds, supports range filters
+//   author       - string, exact match
+// Tags are stored as an array, which Vectorize cannot index, so tag predicates
+// are applied in D1 against the candidate ids instead.
 
-// Placeholder - no logic yet
+// Vectorize batch size for getByIds / deleteByIds calls
+const VECTOR_BATCH_SIZE = 100;
 
+// Upper bound on ids accepted by one /vectorize request
+const MAX_IDS_PER_REQUEST = 1000;
+
+// Vectorize query topK limit when neither values nor metadata are returned
+const MAX_QUERY_TOP_K = 100;
+
+// Every article has at most one vector, keyed by its D1 id
+export function vectorIdFor(articleId) {
+  return `article_${articleId}`;
+}
+
+export function articleIdFromVectorId(vectorId) {
+  const match = /^article_(\d+)$/.exec(vectorId);
+  return match ? parseInt(match[1]) : null;
+}
+
+// Convert a date string (or Date / number) into Unix seconds, or null if unparseable
+export function toTimestamp(value) {
+  if (value === undefined || value === null || value === "") return null;
+  if (typeof value === "number") return Math.floor(value);
+  const ms = new Date(value).getTime();
+  return Number.isNaN(ms) ? null : Math.floor(ms / 1000);
+}
+
+// Metadata stored alongside every article vector
+export function buildVectorMetadata(article) {
+  const published_at = article.published_at || new Date().toISOString();
+  const metadata = {
+    article_id: parseInt(article.id),
+    title: article.title || "",
+    tags: article.tags || [],
+    published_at: published_at,
+  };
+
+  const publishedTs = toTimestamp(published_at);
+  if (publishedTs !== null) metadata.published_ts = publishedTs;
+  if (article.author) metadata.author = article.author;
+
+  return metadata;
+}
+
+// Normalize filter parameters from a request body. Accepts either a nested
+// `filters` object or top-level fields: tags, author, published_after, published_before.
+export function parseFilters(body) {
+  const source = body.filters || body;
+  const filters = {};
+
+  if (source.tags) {
+    const tags = Array.isArray(source.tags) ? source.tags : [source.tags];
+    const cleaned = tags.map((t) => String(t).trim()).filter(Boolean);
+    if (cleaned.length > 0) filters.tags = cleaned;
+  }
+  if (source.author) filters.author = String(source.author);
+
+  const after = toTimestamp(source.published_after);
+  const before = toTimestamp(source.published_before);
+  if (after !== null) filters.published_after = after;
+  if (before !== null) filters.published_before = before;
+
+  return filters;
+}
+
+// Split filters into the part Vectorize can evaluate and whether D1 must finish the job
+export function buildVectorFilter(filters) {
+  const vectorFilter = {};
+
+  if (filters.author) {
+    vectorFilter.author = { $eq: filters.author };
+  }
+  if (filters.published_after !== undefined || filters.published_before !== undefined) {
+    vectorFilter.published_ts = {};
+    if (filters.published_after !== undefined) vectorFilter.published_ts.$gte = filters.published_after;
+    if (filters.published_before !== undefined) vectorFilter.published_ts.$lte = filters.published_before;
+  }
+
+  return {
+    vectorFilter: Object.keys(vectorFilter).length > 0 ? vectorFilter : null,
+    needsD1Filter: Boolean(filters.tags),
+  };
+}
+
+// Build a WHERE fragment that re-applies the filters in D1. Pushed-down predicates are
+// repeated so results stay correct for vectors written before the metadata existed.
+export function buildD1FilterClause(filters) {
+  const clauses = [];
+  const params = [];
+
+  if (filters.tags) {
+    const placeholders = filters.tags.map(() => "?").join(",");
+    clauses.push(
+      `EXISTS (SELECT 1 FROM json_each(articles.tags) WHERE lower(json_each.value) IN (${placeholders}))`
+    );
+    params.push(...filters.tags.map((t) => t.toLowerCase()));
+  }
+  if (filters.author) {
+    clauses.push("author = ?");
+    params.push(filters.author);
+  }
+  if (filters.published_after !== undefined) {
+    clauses.push("published_ts >= ?");
+    params.push(filters.published_after);
+  }
+  if (filters.published_before !== undefined) {
+    clauses.push("published_ts <= ?");
+    params.push(filters.published_before);
+  }
+
+  return {
+    sql: clauses.length > 0 ? ` AND ${clauses.join(" AND ")}` : "",
+    params,
+  };
+}
+
+// Run a Vectorize query with filters pushed down where possible. Only over-fetches
+// when a predicate (tags) has to be evaluated in D1 afterwards.
+// Returns Vectorize matches with an added article_id.
+export async function queryVectors(env, embedding, topK, filters = {}) {
+  const { vectorFilter, needsD1Filter } = buildVectorFilter(filters);
+  // No metadata is returned: the article id comes from the vector id, and V2 indexes cap
+  // topK at 20 when metadata is returned but allow up to 100 without it
+  const options = {
+    topK: needsD1Filter ? Math.min(topK * 4, MAX_QUERY_TOP_K) : Math.min(topK, MAX_QUERY_TOP_K),
+    returnValues: false,
+    returnMetadata: "none",
+  };
+  if (vectorFilter) options.filter = vectorFilter;
+
+  const vectorResults = await env.VECTORIZE.query(embedding, options);
+  return (vectorResults.matches || []).map((match) => ({
+    ...match,
+    article_id: articleIdFromVectorId(match.id),
+  }));
+}
+
+// Which of the given article ids have a vector. Returns the article ids that exist.
+async function existingVectorIds(env, articleIds) {
+  const existing = [];
+  for (let i = 0; i < articleIds.length; i += VECTOR_BATCH_SIZE) {
+    const batch = articleIds.slice(i, i + VECTOR_BATCH_SIZE).map(vectorIdFor);
+    const vectors = await env.VECTORIZE.getByIds(batch);
+    for (const vector of vectors || []) {
+      const id = articleIdFromVectorId(vector.id);
+      if (id !== null) existing.push(id);
+    }
+  }
+  return existing;
+}
+
+// Fetch stored vectors (values and metadata) for the given article ids
+async function getVectors(env, articleIds) {
+  const vectors = [];
+  for (let i = 0; i < articleIds.length; i += VECTOR_BATCH_SIZE) {
+    const batch = articleIds.slice(i, i + VECTOR_BATCH_SIZE).map(vectorIdFor);
+    for (const vector of (await env.VECTORIZE.getByIds(batch)) || []) {
+      vectors.push({
+        article_id: articleIdFromVectorId(vector.id),
+        values: Array.from(vector.values || []),
+        metadata: vector.metadata || {},
+      });
+    }
+  }
+  return vectors;
+}
+
+// Delete the vectors for the given article ids. Returns the number of delete calls made.
+async function deleteVectors(env, articleIds) {
+  let batches = 0;
+  for (let i = 0; i < articleIds.length; i += VECTOR_BATCH_SIZE) {
+    await env.VECTORIZE.deleteByIds(articleIds.slice(i, i + VECTOR_BATCH_SIZE).map(vectorIdFor));
+    batches++;
+  }
+  return batches;
+}
+
+// POST /vectorize { action: "exists" | "get" | "delete", ids: [article ids] }
+// POST /vectorize { action: "upsert", vectors: [{ article_id, values, metadata }] }
+export default {
+  async fetch(request, env) {
+    const { method } = request;
+
+    // CORS headers
+    const corsHeaders = {
+      "Access-Control-Allow-Origin": "*",
+      "Access-Control-Allow-Methods": "POST, OPTIONS",
+      "Access-Control-Allow-Headers": "Content-Type",
+    };
+
+    if (method === "OPTIONS") {
+      return new Response(null, { headers: corsHeaders });
+    }
+
+    try {
+      if (method === "POST") {
+        const body = await request.json();
+        const { action } = body;
+        const ids = (Array.isArray(body.ids) ? body.ids : [])
+          .map((id) => parseInt(id))
+          .filter((id) => !Number.isNaN(id));
+
+        if (!env.VECTORIZE) {
+          return new Response(
+            JSON.stringify({ error: "Vectorize not configured" }),
+            {
+              status: 500,
+              headers: { ...corsHeaders, "Content-Type": "application/json" },
+            }
+          );
+        }
+
+        if (ids.length > MAX_IDS_PER_REQUEST) {
+          return new Response(
+            JSON.stringify({ error: `At most ${MAX_IDS_PER_REQUEST} ids per request` }),
+            {
+              status: 400,
+              headers: { ...corsHeaders, "Content-Type": "application/json" },
+            }
+          );
+        }
+
+        if (action === "exists") {
+          const existing = await existingVectorIds(env, ids);
+          return new Response(JSON.stringify({ ids: existing, count: existing.length }), {
+            headers: { ...corsHeaders, "Content-Type": "application/json" },
+          });
+        }
+
+        if (action === "get") {
+          const vectors = await getVectors(env, ids);
+          return new Response(JSON.stringify({ vectors, count: vectors.length }), {
+            headers: { ...corsHeaders, "Content-Type": "application/json" },
+          });
+        }
+
+        if (action === "upsert") {
+          const vectors = Array.isArray(body.vectors) ? body.vectors : [];
+          if (vectors.length > MAX_IDS_PER_REQUEST) {
+            return new Response(
+              JSON.stringify({ error: `At most ${MAX_IDS_PER_REQUEST} vectors per request` }),
+              {
+                status: 400,
+                headers: { ...corsHeaders, "Content-Type": "application/json" },
+              }
+            );
+          }
+          // Stored values are written back as-is: no Workers AI call
+          for (let i = 0; i < vectors.length; i += VECTOR_BATCH_SIZE) {
+            await env.VECTORIZE.upsert(
+              vectors.slice(i, i + VECTOR_BATCH_SIZE).map((vector) => ({
+                id: vectorIdFor(vector.article_id),
+                values: vector.values,
+                metadata: vector.metadata || {},
+              }))
+            );
+          }
+          return new Response(JSON.stringify({ upserted: vectors.length }), {
+            headers: { ...corsHeaders, "Content-Type": "application/json" },
+          });
+        }
+
+        if (action === "delete") {
+          const batches = await deleteVectors(env, ids);
+          return new Response(JSON.stringify({ deleted: ids.length, batches }), {
+            headers: { ...corsHeaders, "Content-Type": "application/json" },
+          });
+        }
+
+        return new Response(
+          JSON.stringify({ error: "action must be 'exists', 'get', 'upsert' or 'delete'" }),
+          {
+            status: 400,
+            headers: { ...corsHeaders, "Content-Type": "application/json" },
+          }
+        );
+      }
+
+      return new Response("Method not allowed", { status: 405, headers: corsHeaders });
+    } catch (error) {
+      console.error("Vectorize API error:", error);
+      return new Response(
+        JSON.stringify({ error: error.message || "Internal server error" }),
+        {
+          status: 500,
+          headers: { ...corsHeaders, "Content-Type": "application/json" },
+        }
+      );
+    }
+  },
+};
@@ -0,0 +1,12 @@
+-- Add a numeric, range-indexable publish timestamp to existing databases
+-- Run once on databases created before published_ts was added to schema.sql:
+--   npx wrangler d1 execute novanewz-db --file=./migrations/0001_published_ts.sql
+
+ALTER TABLE articles ADD COLUMN published_ts INTEGER;
+
+UPDATE articles
+SET published_ts = CAST(strftime('%s', published_at) AS INTEGER)
+WHERE published_at IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_published_ts ON articles(published_ts);
+CREATE INDEX IF NOT EXISTS idx_author ON articles(author);
@@ -0,0 +1,30 @@
+-- Add the FTS5 keyword index to existing databases and index the articles already stored
+-- Run once on databases created before articles_fts was added to schema.sql:
+--   npx wrangler d1 execute novanewz-db --file=./migrations/0002_articles_fts.sql
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+  title,
+  content,
+  tags,
+  content='articles',
+  content_rowid='id',
+  tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+  INSERT INTO articles_fts(rowid, title, content, tags)
+  VALUES (new.id, new.title, new.content, new.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+  INSERT INTO articles_fts(articles_fts, rowid, title, content, tags)
+  VALUES ('delete', old.id, old.title, old.content, old.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title, content, tags ON articles BEGIN
+  INSERT INTO articles_fts(articles_fts, rowid, title, content, tags)
+  VALUES ('delete', old.id, old.title, old.content, old.tags);
+  INSERT INTO articles_fts(rowid, title, content, tags)
+  VALUES (new.id, new.title, new.content, new.tags);
+END;
+
+INSERT INTO articles_fts(articles_fts) VALUES ('rebuild');
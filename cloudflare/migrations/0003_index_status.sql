@@ -0,0 +1,13 @@
+-- Track background vector indexing on existing databases
+-- Run once on databases created before index_status was added to schema.sql:
+--   npx wrangler d1 execute novanewz-db --file=./migrations/0003_index_status.sql
+
+ALTER TABLE articles ADD COLUMN index_status TEXT NOT NULL DEFAULT 'pending';
+ALTER TABLE articles ADD COLUMN index_attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE articles ADD COLUMN indexed_at TEXT;
+
+-- Existing articles were embedded synchronously on write; treat them as indexed so the
+-- cron sweep does not re-embed the whole corpus (reconcile_vectors.py finds any gaps)
+UPDATE articles SET index_status = 'indexed';
+
+CREATE INDEX IF NOT EXISTS idx_index_status ON articles(index_status, updated_at);
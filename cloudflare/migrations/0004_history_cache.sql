@@ -0,0 +1,12 @@
+-- Add the /history response cache to existing databases
+-- Run once on databases created before history_cache was added to schema.sql:
+--   npx wrangler d1 execute novanewz-db --file=./migrations/0004_history_cache.sql
+CREATE TABLE IF NOT EXISTS history_cache (
+  cache_key TEXT PRIMARY KEY,
+  query TEXT NOT NULL,
+  article_ids TEXT NOT NULL, -- JSON array of contributing article ids
+  response TEXT NOT NULL, -- JSON {summary, timeline, sources}
+  created_at TEXT DEFAULT (datetime('now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_history_cache_created_at ON history_cache(created_at);
@@ -8,11 +8,58 @@ CREATE TABLE IF NOT EXISTS articles (
   tags TEXT, -- JSON array stored as string
   author TEXT,
   published_at TEXT,
+  published_ts INTEGER, -- published_at as Unix seconds, for range filters
   created_at TEXT DEFAULT (datetime('now')),
-  updated_at TEXT DEFAULT (datetime('now'))
+  updated_at TEXT DEFAULT (datetime('now')),
+  index_status TEXT NOT NULL DEFAULT 'pending', -- pending | indexed | failed (vector in Vectorize)
+  index_attempts INTEGER NOT NULL DEFAULT 0,
+  indexed_at TEXT
 );
 
 -- Create index for faster queries
 CREATE INDEX IF NOT EXISTS idx_published_at ON articles(published_at);
 CREATE INDEX IF NOT EXISTS idx_created_at ON articles(created_at);
+CREATE INDEX IF NOT EXISTS idx_published_ts ON articles(published_ts);
+CREATE INDEX IF NOT EXISTS idx_author ON articles(author);
+CREATE INDEX IF NOT EXISTS idx_index_status ON articles(index_status, updated_at);
 
+
+-- Cache of generated /history responses
+-- cache_key is a SHA-256 of the normalized query plus the ids and updated_at of the contributing articles
+CREATE TABLE IF NOT EXISTS history_cache (
+  cache_key TEXT PRIMARY KEY,
+  query TEXT NOT NULL,
+  article_ids TEXT NOT NULL, -- JSON array of contributing article ids
+  response TEXT NOT NULL, -- JSON {summary, timeline, sources}
+  created_at TEXT DEFAULT (datetime('now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_history_cache_created_at ON history_cache(created_at);
+
+-- Full-text keyword index over articles (BM25 ranking for lexical and hybrid search)
+-- External-content table: the text lives in articles, the triggers below keep the index in sync
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+  title,
+  content,
+  tags,
+  content='articles',
+  content_rowid='id',
+  tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+  INSERT INTO articles_fts(rowid, title, content, tags)
+  VALUES (new.id, new.title, new.content, new.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+  INSERT INTO articles_fts(articles_fts, rowid, title, content, tags)
+  VALUES ('delete', old.id, old.title, old.content, old.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title, content, tags ON articles BEGIN
+  INSERT INTO articles_fts(articles_fts, rowid, title, content, tags)
+  VALUES ('delete', old.id, old.title, old.content, old.tags);
+  INSERT INTO articles_fts(rowid, title, content, tags)
+  VALUES (new.id, new.title, new.content, new.tags);
+END;
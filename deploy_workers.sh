@@ -81,6 +81,8 @@ VEC_EXISTS=$(npx wrangler vectorize list 2>/dev/null | grep "novanewz-vectors" |
 if [ -z "$VEC_EXISTS" ]; then
     echo "Vectorize index not found. Creating..."
     npx wrangler vectorize create novanewz-vectors --dimensions=768 --metric=cosine
+    npx wrangler vectorize create-metadata-index novanewz-vectors --property-name=published_ts --type=number
+    npx wrangler vectorize create-metadata-index novanewz-vectors --property-name=author --type=string
     echo -e "${GREEN}✓ Vectorize index created${NC}"
 else
     echo -e "${GREEN}✓ Vectorize index 'novanewz-vectors' exists${NC}"
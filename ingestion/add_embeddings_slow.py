@@ -40,6 +40,7 @@ def add_embeddings(api_url: str, limit: int = 10, delay: int = 3):
                     "title": article['title'],
                     "tags": tags,
                     "published_at": published_at,
+                    "updated_at": article.get('updated_at'),
                 },
                 headers={"Content-Type": "application/json"},
                 timeout=30
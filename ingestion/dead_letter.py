@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Persistent dead-letter queue for failed article inserts and embeddings.
+
+ingest_data.py and embed_all_articles.py record every item they give up on in a local
+SQLite file along with the failure reason, attempt count and the time it next becomes
+eligible. The retry worker drains eligible items in large batches with jittered
+backoff, optionally only inside a quiet-hours window. Items that keep failing are
+parked as poison so neither the pipeline nor the worker keeps spending time on them.
+
+  python dead_letter.py retry --api-url URL [--quiet-hours 1-6] [--watch 600]
+  python dead_letter.py stats
+  python dead_letter.py requeue   # give parked poison items another round
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime
+
+from time_windows import in_off_peak_window, parse_window
+
+DEFAULT_DB_PATH = "dead_letters.db"
+MAX_ATTEMPTS = 8  # Failures before an item is parked as poison
+BASE_BACKOFF = 60  # Seconds before the first retry
+MAX_BACKOFF = 6 * 3600  # Backoff ceiling
+RETRY_BATCH_SIZE = 500  # Items claimed per retry pass
+
+KIND_INSERT = "insert"  # Payload is a transformed article that never reached D1
+KIND_EMBED = "embed"  # Payload is a stored article (with id) that has no vector
+
+PENDING = "pending"
+POISON = "poison"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dead_letters (
+    kind TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    reason TEXT,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL DEFAULT 'pending',
+    first_failed_at TEXT NOT NULL,
+    last_failed_at TEXT NOT NULL,
+    next_eligible_at REAL NOT NULL,
+    PRIMARY KEY (kind, item_key)
+);
+CREATE INDEX IF NOT EXISTS idx_dead_letters_eligible ON dead_letters(status, next_eligible_at);
+"""
+
+
+def backoff_delay(attempts, base=BASE_BACKOFF, cap=MAX_BACKOFF):
+    """
+    Seconds until the next retry after `attempts` failures.
+    Equal jitter: half the exponential delay is fixed, half is random, so items that
+    failed together in a rate-limit storm don't all come due at the same moment.
+    """
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def item_key(kind, payload):
+    """Stable key for an item: the article id for embeds, a content hash for inserts."""
+    if kind == KIND_EMBED:
+        return str(payload["id"])
+    identity = json.dumps([payload.get("title"), payload.get("published_at"), payload.get("author")])
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+class DeadLetterStore:
+    """SQLite-backed dead-letter queue. One row per (kind, item key)."""
+
+    def __init__(self, path=DEFAULT_DB_PATH, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._conn = None
+
+    @property
+    def conn(self):
+        # Opened on first use so runs without failures never create the file
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def exists(self):
+        return self._conn is not None or os.path.exists(self.path)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def record(self, kind, payload, reason):
+        """Record a failure, bumping the attempt count if the item is already queued."""
+        key = item_key(kind, payload)
+        now = datetime.now().isoformat()
+        row = self.conn.execute(
+            "SELECT attempts FROM dead_letters WHERE kind = ? AND item_key = ?", (kind, key)
+        ).fetchone()
+        attempts = (row["attempts"] + 1) if row else 1
+        status = POISON if attempts >= self.max_attempts else PENDING
+
+        with self.conn:
+            self.conn.execute(
+                """INSERT INTO dead_letters
+                     (kind, item_key, payload, reason, attempts, status, first_failed_at, last_failed_at, next_eligible_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(kind, item_key) DO UPDATE SET
+                     payload = excluded.payload,
+                     reason = excluded.reason,
+                     attempts = excluded.attempts,
+                     status = excluded.status,
+                     last_failed_at = excluded.last_failed_at,
+                     next_eligible_at = excluded.next_eligible_at""",
+                (kind, key, json.dumps(payload), reason, attempts, status, now, now,
+                 time.time() + backoff_delay(attempts))
+            )
+        return status
+
+    def defer(self, kind, payloads, reason):
+        """
+        Push items back by a backoff delay without spending an attempt. Used for rate
+        limits, which say nothing about the items, so a rate-limit storm can't park them
+        as poison. Items not queued yet are added with no attempts.
+        """
+        now = datetime.now().isoformat()
+        rows = []
+        for payload in payloads:
+            key = item_key(kind, payload)
+            row = self.conn.execute(
+                "SELECT attempts FROM dead_letters WHERE kind = ? AND item_key = ?", (kind, key)
+            ).fetchone()
+            attempts = row["attempts"] if row else 0
+            rows.append((kind, key, json.dumps(payload), reason, attempts, PENDING, now, now,
+                         time.time() + backoff_delay(max(attempts, 1))))
+
+        with self.conn:
+            self.conn.executemany(
+                """INSERT INTO dead_letters
+                     (kind, item_key, payload, reason, attempts, status, first_failed_at, last_failed_at, next_eligible_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(kind, item_key) DO UPDATE SET
+                     reason = excluded.reason,
+                     last_failed_at = excluded.last_failed_at,
+                     next_eligible_at = excluded.next_eligible_at""",
+                rows
+            )
+
+    def resolve(self, kind, payloads):
+        """Remove items that have now succeeded."""
+        if not self.exists():
+            return
+        keys = [(kind, item_key(kind, p)) for p in payloads]
+        with self.conn:
+            self.conn.executemany("DELETE FROM dead_letters WHERE kind = ? AND item_key = ?", keys)
+
+    def claim_eligible(self, limit=RETRY_BATCH_SIZE):
+        """Pending items whose backoff has expired, oldest due first."""
+        if not self.exists():
+            return []
+        rows = self.conn.execute(
+            """SELECT kind, payload, attempts FROM dead_letters
+               WHERE status = ? AND next_eligible_at <= ?
+               ORDER BY next_eligible_at LIMIT ?""",
+            (PENDING, time.time(), limit)
+        ).fetchall()
+        return [(row["kind"], json.loads(row["payload"]), row["attempts"]) for row in rows]
+
+    def poison_ids(self, kind=KIND_EMBED):
+        """Article ids parked as poison, so the main pipeline can skip them."""
+        if not self.exists():
+            return set()
+        rows = self.conn.execute(
+            "SELECT item_key FROM dead_letters WHERE kind = ? AND status = ?", (kind, POISON)
+        ).fetchall()
+        return {int(row["item_key"]) for row in rows}
+
+    def requeue_poison(self):
+        """Give every parked item a fresh set of attempts."""
+        if not self.exists():
+            return 0
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE dead_letters SET status = ?, attempts = 0, next_eligible_at = ? WHERE status = ?",
+                (PENDING, time.time(), POISON)
+            )
+        return cursor.rowcount
+
+    def stats(self):
+        """Counts per kind and status, plus how many pending items are due now."""
+        if not self.exists():
+            return {"by_kind": {}, "due_now": 0}
+        counts = {}
+        for row in self.conn.execute(
+            "SELECT kind, status, COUNT(*) AS n FROM dead_letters GROUP BY kind, status"
+        ):
+            counts.setdefault(row["kind"], {})[row["status"]] = row["n"]
+        due = self.conn.execute(
+            "SELECT COUNT(*) FROM dead_letters WHERE status = ? AND next_eligible_at <= ?",
+            (PENDING, time.time())
+        ).fetchone()[0]
+        return {"by_kind": counts, "due_now": due}
+
+
+# ---------------------------------------------------------------------------
+# Retry worker
+# ---------------------------------------------------------------------------
+
+def is_rate_limited(status):
+    # Only 429 is a rate limit; the Worker also answers 500 for a bad article or AI error
+    return status == 429
+
+
+def record_failures(store, articles, error, status):
+    """Record failed embeddings, deferring rather than counting them if rate limited."""
+    if is_rate_limited(status):
+        store.defer(KIND_EMBED, articles, error)
+        return
+    for article in articles:
+        store.record(KIND_EMBED, article, error)
+
+
+def retry_inserts(store, items, api_url):
+    """Re-insert articles into D1. Returns the stored articles that now need embeddings."""
+    # Imported here because the pipelines import this module to record failures
+    from ingest_data import find_existing_article, insert_article
+
+    inserted = []
+    for article in items:
+        # POST /articles is not idempotent and the failed insert may have committed before
+        # its response was lost, so only insert if the article isn't stored already
+        created, error = find_existing_article(article, api_url)
+        if error:
+            store.record(KIND_INSERT, article, error)
+            continue
+        if created is None:
+            created, error = insert_article(article, api_url)
+        if created and created.get("id"):
+            store.resolve(KIND_INSERT, [article])
+            inserted.append({**article, "id": created["id"], "updated_at": created.get("updated_at")})
+        else:
+            store.record(KIND_INSERT, article, error or "No ID returned")
+    return inserted
+
+
+def retry_embeddings(store, articles, api_url, delay):
+    """
+    Embed articles in packed batches. A batch that fails for any reason other than a rate
+    limit is retried one article at a time, so a single poison item can't sink the rest.
+    A rate limit ends the pass: what was sent is deferred without spending an attempt and
+    the articles not sent yet are deferred with it.
+    Returns (succeeded, failed, rate_limited).
+    """
+    from embed_all_articles import add_embedding_batch_with_retry, add_embedding_with_retry
+    from token_packer import pack_batches
+
+    by_id = {a["id"]: a for a in articles}
+    pending = set(by_id)
+    succeeded = failed = 0
+
+    for batch_num, batch in enumerate(pack_batches(articles), start=1):
+        if batch_num > 1:
+            time.sleep(delay)
+        batch_articles = [by_id[item["article_id"]] for item in batch]
+        pending.difference_update(a["id"] for a in batch_articles)
+
+        success, error, status = add_embedding_batch_with_retry(batch, api_url, max_retries=1, base_delay=delay)
+        if success:
+            store.resolve(KIND_EMBED, batch_articles)
+            succeeded += len(batch_articles)
+            continue
+
+        if is_rate_limited(status):
+            # Articles inserted earlier in this pass have no embed entry yet, so defer adds them
+            store.defer(KIND_EMBED, batch_articles + [by_id[i] for i in pending], error)
+            return succeeded, failed, True
+
+        for n, article in enumerate(batch_articles):
+            ok, single_error, single_status = add_embedding_with_retry(article, api_url, max_retries=1, base_delay=delay)
+            if ok:
+                store.resolve(KIND_EMBED, [article])
+                succeeded += 1
+            elif is_rate_limited(single_status):
+                store.defer(KIND_EMBED, batch_articles[n:] + [by_id[i] for i in pending], single_error)
+                return succeeded, failed, True
+            else:
+                store.record(KIND_EMBED, article, single_error)
+                failed += 1
+
+    # Articles the packer dropped (no content) count as failures and end up parked
+    for article_id in pending:
+        store.record(KIND_EMBED, by_id[article_id], "No content to embed")
+        failed += 1
+
+    return succeeded, failed, False
+
+
+def retry_pass(store, api_url, batch_size=RETRY_BATCH_SIZE, delay=3.0):
+    """
+    Drain one batch of eligible dead letters.
+    Returns (items claimed, whether the pass stopped on a rate limit).
+    """
+    claimed = store.claim_eligible(batch_size)
+    if not claimed:
+        print("No dead letters are due")
+        return 0, False
+
+    inserts = [payload for kind, payload, _ in claimed if kind == KIND_INSERT]
+    embeds = [payload for kind, payload, _ in claimed if kind == KIND_EMBED]
+    print(f"Retrying {len(inserts)} inserts and {len(embeds)} embeddings...")
+
+    if inserts:
+        inserted = retry_inserts(store, inserts, api_url)
+        print(f"  Inserted {len(inserted)}/{len(inserts)} articles")
+        embeds.extend(inserted)
+
+    rate_limited = False
+    if embeds:
+        succeeded, failed, rate_limited = retry_embeddings(store, embeds, api_url, delay)
+        print(f"  Embedded {succeeded}, failed {failed}" + (" (rate limited, backing off)" if rate_limited else ""))
+
+    return len(claimed), rate_limited
+
+
+def run_worker(store, api_url, batch_size=RETRY_BATCH_SIZE, delay=3.0, quiet_hours=None, watch=0):
+    """Retry dead letters, pass after pass, until none are due (or forever with watch)."""
+    while True:
+        if quiet_hours and not in_off_peak_window(*quiet_hours):
+            if not watch:
+                print(f"Outside quiet hours ({quiet_hours[0]:02d}:00-{quiet_hours[1]:02d}:00 UTC), nothing to do")
+                return
+        else:
+            claimed, rate_limited = retry_pass(store, api_url, batch_size, delay)
+            if claimed == batch_size and not rate_limited:
+                continue  # A full batch was due, so there is probably more
+
+        if not watch:
+            return
+        time.sleep(watch + random.uniform(0, watch / 10))
+
+
+def print_stats(store):
+    stats = store.stats()
+    print(f"Dead letters in {store.path}:")
+    if not stats["by_kind"]:
+        print("  (empty)")
+    for kind, counts in sorted(stats["by_kind"].items()):
+        print(f"  {kind:<8} pending {counts.get(PENDING, 0):6d}   poison {counts.get(POISON, 0):6d}")
+    print(f"  Due now: {stats['due_now']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and retry NovaNewz dead-lettered inserts and embeddings")
+    parser.add_argument("command", choices=["retry", "stats", "requeue"],
+                        help="retry due items, show counts, or requeue parked poison items")
+    parser.add_argument(
+        "--api-url",
+        type=str,
+        default=os.getenv("API_BASE_URL", "http://localhost:8787"),
+        help="Base URL of the Workers API"
+    )
+    parser.add_argument(
+        "--db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help=f"Dead-letter database file (default: {DEFAULT_DB_PATH})"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=RETRY_BATCH_SIZE,
+        help=f"Items claimed per retry pass (default: {RETRY_BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=3.0,
+        help="Seconds between embedding batches (default: 3)"
+    )
+    parser.add_argument(
+        "--quiet-hours",
+        type=parse_window,
+        default=None,
+        metavar="START-END",
+        help="Only retry inside this UTC hour window, e.g. 1-6"
+    )
+    parser.add_argument(
+        "--watch",
+        type=float,
+        default=0,
+        metavar="SECONDS",
+        help="Keep running, checking for due items every SECONDS (0 = one run)"
+    )
+
+    args = parser.parse_args()
+    store = DeadLetterStore(args.db)
+
+    try:
+        if args.command == "stats":
+            print_stats(store)
+        elif args.command == "requeue":
+            print(f"Requeued {store.requeue_poison()} poison items")
+        else:
+            print("=" * 60)
+            print("NovaNewz - Dead-Letter Retry")
+            print("=" * 60)
+            print(f"API URL: {args.api_url}")
+            if args.quiet_hours:
+                print(f"Quiet hours: {args.quiet_hours[0]:02d}:00-{args.quiet_hours[1]:02d}:00 UTC")
+            print("=" * 60)
+            run_worker(store, args.api_url, args.batch_size, args.delay, args.quiet_hours, args.watch)
+            print_stats(store)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
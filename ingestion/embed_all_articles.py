@@ -5,20 +5,43 @@ Runs in background, tracks progress, resumes from failures.
 """
 
 import requests
-import time
 import json
 import argparse
 from datetime import datetime
 import os
 
-def get_articles_without_embeddings(api_url):
+from profiling import phase, profiled_sleep, profiled_iter, start_profiling, stop_profiling, DEFAULT_OUTPUT_DIR
+from token_packer import pack_batches, MAX_BATCH_TOKENS, MAX_BATCH_BYTES, MAX_BATCH_TEXTS, MAX_CHUNKS_PER_ARTICLE
+from dead_letter import DeadLetterStore, DEFAULT_DB_PATH, KIND_EMBED, record_failures
+from embedding_scheduler import (
+    EmbeddingScheduler,
+    load_popularity,
+    DEFAULT_RECENCY_WEIGHT,
+    DEFAULT_POPULARITY_WEIGHT,
+    DEFAULT_HALF_LIFE_DAYS,
+    DEFAULT_FRESH_HOURS,
+)
+
+def load_queued_ids(ids_file):
+    """Load article ids queued for embedding (e.g. by reconcile_vectors.py)."""
+    with open(ids_file) as f:
+        return set(json.load(f).get('ids', []))
+
+
+def get_articles_without_embeddings(api_url, only_ids=None):
     """Get list of article IDs that don't have embeddings yet."""
     print("Fetching all articles...")
-    response = requests.get(f"{api_url}/articles", timeout=30)
-    response.raise_for_status()
-    all_articles = response.json()
+    with phase("network"):
+        response = requests.get(f"{api_url}/articles", timeout=30)
+        response.raise_for_status()
+    with phase("json_decode"):
+        all_articles = response.json()
     
     print(f"Total articles in database: {len(all_articles)}")
+
+    if only_ids is not None:
+        all_articles = [a for a in all_articles if a.get('id') in only_ids]
+        print(f"Restricting to {len(all_articles)} queued articles")
     
     # Check Vectorize to see which ones already have embeddings
     print("Checking which articles already have embeddings...")
@@ -32,66 +55,206 @@ def get_articles_without_embeddings(api_url):
     return articles_needing_embeddings
 
 
-def add_embedding_with_retry(article, api_url, max_retries=3, base_delay=5):
-    """Add embedding with exponential backoff retry."""
-    article_id = article.get('id')
-    title = article.get('title', 'Unknown')[:50]
-    content = article.get('content', '')
-    
+def _post_embed_with_retry(payload, api_url, timeout, max_retries=3, base_delay=5):
+    """
+    POST one /embed request body with exponential backoff retry.
+    Returns (success, error, status code of the last response or None).
+    """
     for attempt in range(max_retries):
         try:
-            response = requests.post(
-                f"{api_url}/embed",
-                json={
-                    "text": content,
-                    "article_id": article_id,
-                    "title": article.get('title'),
-                    "tags": article.get('tags', []),
-                    "published_at": article.get('published_at'),
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=60
-            )
+            with phase("json_serialize"):
+                data = json.dumps(payload)
+            with phase("network"):
+                response = requests.post(
+                    f"{api_url}/embed",
+                    data=data,
+                    headers={"Content-Type": "application/json"},
+                    timeout=timeout
+                )
             
             if response.status_code == 200:
-                return True, None
+                return True, None, 200
             elif response.status_code in [429, 500]:  # Rate limit or AI error
                 if attempt < max_retries - 1:
                     wait_time = base_delay * (2 ** attempt)
                     print(f"    Rate limit/error, waiting {wait_time}s (attempt {attempt + 1}/{max_retries})...")
-                    time.sleep(wait_time)
+                    profiled_sleep(wait_time)
                     continue
-                else:
-                    return False, f"Rate limit after {max_retries} attempts"
-            else:
-                return False, f"HTTP {response.status_code}: {response.text}"
+                elif response.status_code == 429:
+                    return False, f"Rate limit after {max_retries} attempts", 429
+            return False, f"HTTP {response.status_code}: {response.text}", response.status_code
                 
         except requests.exceptions.Timeout:
             if attempt < max_retries - 1:
                 wait_time = base_delay * (2 ** attempt)
                 print(f"    Timeout, waiting {wait_time}s (attempt {attempt + 1}/{max_retries})...")
-                time.sleep(wait_time)
+                profiled_sleep(wait_time)
                 continue
-            return False, "Timeout after retries"
+            return False, "Timeout after retries", None
         except Exception as e:
-            return False, str(e)
+            return False, str(e), None
     
-    return False, "Max retries exceeded"
+    return False, "Max retries exceeded", None
+
+
+def add_embedding_with_retry(article, api_url, max_retries=3, base_delay=5):
+    """Add embedding with exponential backoff retry."""
+    payload = {
+        "text": article.get('content', ''),
+        "article_id": article.get('id'),
+        "title": article.get('title'),
+        "tags": article.get('tags', []),
+        "published_at": article.get('published_at'),
+        "author": article.get('author'),
+        "updated_at": article.get('updated_at'),
+    }
+    return _post_embed_with_retry(payload, api_url, 60, max_retries, base_delay)
 
 
-def embed_all_articles(api_url, batch_size=100, delay=3, start_from=0):
-    """Embed all articles in batches with progress tracking."""
-    articles = get_articles_without_embeddings(api_url)
+def add_embedding_batch_with_retry(items, api_url, max_retries=3, base_delay=5):
+    """Embed a packed batch of articles in one /embed call, with exponential backoff retry."""
+    return _post_embed_with_retry({"items": items}, api_url, 120, max_retries, base_delay)
+
+
+def save_progress(progress_file, last_processed, success_count, fail_count, failed_articles):
+    """Write the resumable progress file."""
+    with open(progress_file, 'w') as f:
+        json.dump({
+            'last_processed': last_processed,
+            'success': success_count,
+            'failed': fail_count,
+            'failed_articles': failed_articles,
+            'timestamp': datetime.now().isoformat()
+        }, f, indent=2)
+    print(f"\n  Progress: {success_count} success, {fail_count} failed (saved to {progress_file})\n")
+
+
+def embed_packed_articles(articles, api_url, total, delay, progress_file, start_from=0,
+                          max_tokens=MAX_BATCH_TOKENS, max_bytes=MAX_BATCH_BYTES, max_texts=MAX_BATCH_TEXTS,
+                          dead_letters=None):
+    """
+    Embed articles in token-budget batches: long articles are chunked, chunks are packed
+    under the per-request budgets, and the Worker pools chunk vectors per article.
+    """
+    success_count = 0
+    fail_count = 0
+    failed_articles = []
+    processed = start_from
+    in_flight = {}  # Original articles by id until their batch finishes, for the dead-letter store
     
-    if start_from > 0:
-        print(f"\nResuming from article {start_from}...")
-        articles = articles[start_from:]
+    def remember(articles):
+        for article in articles:
+            in_flight[article.get('id')] = article
+            yield article
+    
+    pack_stats = {"skipped": [], "truncated": 0}
+    batches = profiled_iter(
+        pack_batches(remember(articles), max_tokens=max_tokens, max_bytes=max_bytes, max_texts=max_texts,
+                     stats=pack_stats),
+        "pack"
+    )
+    for batch_num, batch in enumerate(batches, start=1):
+        chunks = sum(len(item['texts']) for item in batch)
+        print(f"[{processed + 1}-{processed + len(batch)}/{start_from + total}] "
+              f"Batch {batch_num}: {len(batch)} articles, {chunks} chunks...")
+        
+        if batch_num > 1:
+            profiled_sleep(delay)
+        
+        success, error, status = add_embedding_batch_with_retry(batch, api_url, max_retries=3, base_delay=delay)
+        batch_articles = [in_flight.pop(item['article_id']) for item in batch]
+        
+        if success:
+            print(f"  ✓ Success")
+            success_count += len(batch)
+            if dead_letters is not None:
+                dead_letters.resolve(KIND_EMBED, batch_articles)
+        else:
+            print(f"  ✗ Failed: {error}")
+            fail_count += len(batch)
+            failed_articles.extend({
+                'id': item['article_id'],
+                'title': (item.get('title') or 'Unknown')[:60],
+                'error': error
+            } for item in batch)
+            if dead_letters is not None:
+                record_failures(dead_letters, batch_articles, error, status)
+        
+        processed += len(batch)
+        save_progress(progress_file, processed, success_count, fail_count, failed_articles)
+    
+    # Articles the packer could not build a request for (empty content) are failures too
+    skipped = pack_stats["skipped"]
+    if skipped:
+        print(f"  ✗ {len(skipped)} articles have no content to embed")
+        for article in skipped:
+            in_flight.pop(article.get('id'), None)
+            failed_articles.append({
+                'id': article.get('id'),
+                'title': (article.get('title') or 'Unknown')[:60],
+                'error': "No content to embed"
+            })
+            if dead_letters is not None:
+                dead_letters.record(KIND_EMBED, article, "No content to embed")
+        fail_count += len(skipped)
+        processed += len(skipped)
+        save_progress(progress_file, processed, success_count, fail_count, failed_articles)
+    
+    if pack_stats["truncated"]:
+        print(f"  {pack_stats['truncated']} long articles were embedded from their first "
+              f"{MAX_CHUNKS_PER_ARTICLE} chunks only")
+    
+    return success_count, fail_count, failed_articles
+
+
+def embed_all_articles(api_url, batch_size=100, delay=3, start_from=0, ids_file=None,
+                       scheduler=None, poll_every=0, pack=False,
+                       max_batch_tokens=MAX_BATCH_TOKENS, max_batch_bytes=MAX_BATCH_BYTES,
+                       dead_letters=None):
+    """
+    Embed all articles in batches with progress tracking.
+    With a scheduler, articles are embedded in its priority order instead of API order.
+    With pack, articles are sent in token-budget batches instead of one per request.
+    With a dead-letter store, failures are recorded for dead_letter.py to retry and
+    articles already parked there as poison are skipped.
+    """
+    only_ids = load_queued_ids(ids_file) if ids_file else None
+    articles = get_articles_without_embeddings(api_url, only_ids)
+    
+    poison = set()
+    if dead_letters is not None:
+        poison = dead_letters.poison_ids(KIND_EMBED)
+        if poison:
+            articles = [a for a in articles if a.get('id') not in poison]
+            print(f"Skipping {len(poison)} articles parked as poison in {dead_letters.path}")
+    
+    if scheduler is not None:
+        if start_from > 0:
+            print("\n--start-from is ignored with --order freshness (priorities change between runs)")
+            start_from = 0
+        for article in articles:
+            scheduler.push(article)
+        total = len(scheduler)
+        if only_ids is not None and poll_every > 0:
+            print("\nNot polling for new articles: only ids queued in the ids file are embedded")
+            poll_every = 0
+        if poll_every > 0:
+            scheduler.exclude(poison)
+            scheduler.sync_watermark(api_url)
+        print(f"\nScheduling by freshness (recency weight {scheduler.recency_weight}, "
+              f"popularity weight {scheduler.popularity_weight})")
+        articles = scheduler.drain(api_url, poll_every=poll_every)
+    else:
+        if start_from > 0:
+            print(f"\nResuming from article {start_from}...")
+            articles = articles[start_from:]
+        total = len(articles)
     
-    total = len(articles)
     print(f"\nNeed to process {total} articles")
     print(f"Batch size: {batch_size}")
     print(f"Delay between embeddings: {delay}s")
-    print(f"Estimated time: {(total * delay) / 60:.1f} minutes\n")
+    if not pack:
+        print(f"Estimated time: {(total * delay) / 60:.1f} minutes\n")
     print("="*60)
     
     success_count = 0
@@ -101,17 +264,26 @@ def embed_all_articles(api_url, batch_size=100, delay=3, start_from=0):
     # Create progress file
     progress_file = "embedding_progress.json"
     
+    if pack:
+        success_count, fail_count, failed_articles = embed_packed_articles(
+            articles, api_url, total, delay, progress_file, start_from=start_from,
+            max_tokens=max_batch_tokens, max_bytes=max_batch_bytes, dead_letters=dead_letters
+        )
+        articles = []
+    
     for idx, article in enumerate(articles, start=start_from):
         article_id = article.get('id')
         title = article.get('title', 'Unknown')[:60]
         
         print(f"[{idx + 1}/{start_from + total}] Article {article_id}: {title}...")
         
-        success, error = add_embedding_with_retry(article, api_url, max_retries=3, base_delay=delay)
+        success, error, status = add_embedding_with_retry(article, api_url, max_retries=3, base_delay=delay)
         
         if success:
             print(f"  ✓ Success")
             success_count += 1
+            if dead_letters is not None:
+                dead_letters.resolve(KIND_EMBED, [article])
         else:
             print(f"  ✗ Failed: {error}")
             fail_count += 1
@@ -120,22 +292,16 @@ def embed_all_articles(api_url, batch_size=100, delay=3, start_from=0):
                 'title': title,
                 'error': error
             })
+            if dead_letters is not None:
+                record_failures(dead_letters, [article], error, status)
         
         # Save progress every 10 articles
         if (idx + 1) % 10 == 0:
-            with open(progress_file, 'w') as f:
-                json.dump({
-                    'last_processed': idx + 1,
-                    'success': success_count,
-                    'failed': fail_count,
-                    'failed_articles': failed_articles,
-                    'timestamp': datetime.now().isoformat()
-                }, f, indent=2)
-            print(f"\n  Progress: {success_count} success, {fail_count} failed (saved to {progress_file})\n")
+            save_progress(progress_file, idx + 1, success_count, fail_count, failed_articles)
         
         # Wait between embeddings to avoid rate limits
         if idx < start_from + total - 1:  # Don't wait after last one
-            time.sleep(delay)
+            profiled_sleep(delay)
     
     print("\n" + "="*60)
     print("Embedding Complete!")
@@ -146,7 +312,10 @@ def embed_all_articles(api_url, batch_size=100, delay=3, start_from=0):
     
     if failed_articles:
         print(f"\nFailed articles saved to {progress_file}")
-        print("To retry failed articles, check the progress file")
+        if dead_letters is not None:
+            print(f"Failures queued in {dead_letters.path} (retry with: python dead_letter.py retry)")
+        else:
+            print("To retry failed articles, check the progress file")
     
     # Save final report
     with open('embedding_report.json', 'w') as f:
@@ -157,6 +326,15 @@ def embed_all_articles(api_url, batch_size=100, delay=3, start_from=0):
             'failed': fail_count,
             'failed_articles': failed_articles
         }, f, indent=2)
+
+    # Leave only the failures in the queue so the next run retries just those
+    if ids_file:
+        with open(ids_file, 'w') as f:
+            json.dump({
+                'updated_at': datetime.now().isoformat(),
+                'ids': sorted(a['id'] for a in failed_articles),
+            }, f, indent=2)
+        print(f"Queue {ids_file} now holds {len(failed_articles)} failed articles")
     
     return success_count, fail_count
 
@@ -187,6 +365,85 @@ def main():
         default=0,
         help="Resume from this article index (default: 0)"
     )
+    parser.add_argument(
+        "--ids-file",
+        type=str,
+        default=None,
+        help="Only embed article ids queued in this JSON file (written by reconcile_vectors.py)"
+    )
+    parser.add_argument(
+        "--pack",
+        action="store_true",
+        help="Send token-budget batches of chunked articles instead of one article per request"
+    )
+    parser.add_argument(
+        "--max-batch-tokens",
+        type=int,
+        default=MAX_BATCH_TOKENS,
+        help=f"Estimated token budget per packed request (default: {MAX_BATCH_TOKENS})"
+    )
+    parser.add_argument(
+        "--max-batch-bytes",
+        type=int,
+        default=MAX_BATCH_BYTES,
+        help=f"Request body budget in bytes per packed request (default: {MAX_BATCH_BYTES})"
+    )
+    parser.add_argument(
+        "--order",
+        choices=["api", "freshness"],
+        default="api",
+        help="'api' embeds in GET /articles order, 'freshness' prioritises recent and popular articles"
+    )
+    parser.add_argument(
+        "--recency-weight",
+        type=float,
+        default=DEFAULT_RECENCY_WEIGHT,
+        help=f"Weight of publish recency in freshness order (default: {DEFAULT_RECENCY_WEIGHT})"
+    )
+    parser.add_argument(
+        "--popularity-weight",
+        type=float,
+        default=DEFAULT_POPULARITY_WEIGHT,
+        help=f"Weight of popularity in freshness order (default: {DEFAULT_POPULARITY_WEIGHT})"
+    )
+    parser.add_argument(
+        "--half-life-days",
+        type=float,
+        default=DEFAULT_HALF_LIFE_DAYS,
+        help=f"Days for the recency score to halve (default: {DEFAULT_HALF_LIFE_DAYS})"
+    )
+    parser.add_argument(
+        "--fresh-hours",
+        type=float,
+        default=DEFAULT_FRESH_HOURS,
+        help=f"Articles created within this many hours jump the queue (default: {DEFAULT_FRESH_HOURS})"
+    )
+    parser.add_argument(
+        "--popularity-file",
+        type=str,
+        default=None,
+        help="JSON map of article id to view/click count used for popularity"
+    )
+    parser.add_argument(
+        "--poll-every",
+        type=int,
+        default=25,
+        help="With freshness order, check for newly created articles every N embeddings (0 = never)"
+    )
+    parser.add_argument(
+        "--dead-letter-db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help=f"Record failed embeddings here for dead_letter.py to retry (default: {DEFAULT_DB_PATH})"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=DEFAULT_OUTPUT_DIR,
+        default=None,
+        metavar="DIR",
+        help=f"Profile the run (CPU samples, allocations, time split) and write reports to DIR (default: {DEFAULT_OUTPUT_DIR})"
+    )
     
     args = parser.parse_args()
     
@@ -201,12 +458,34 @@ def main():
     print("This will take a while. Check embedding_progress.json for updates.")
     print("="*60)
     
+    scheduler = None
+    if args.order == "freshness":
+        scheduler = EmbeddingScheduler(
+            recency_weight=args.recency_weight,
+            popularity_weight=args.popularity_weight,
+            half_life_days=args.half_life_days,
+            fresh_hours=args.fresh_hours,
+            popularity=load_popularity(args.popularity_file),
+        )
+    
+    dead_letters = DeadLetterStore(args.dead_letter_db)
+    
+    if args.profile:
+        start_profiling(args.profile)
+    
     try:
         success, failed = embed_all_articles(
             args.api_url,
             batch_size=args.batch_size,
             delay=args.delay,
-            start_from=args.start_from
+            start_from=args.start_from,
+            ids_file=args.ids_file,
+            scheduler=scheduler,
+            poll_every=args.poll_every,
+            pack=args.pack,
+            max_batch_tokens=args.max_batch_tokens,
+            max_batch_bytes=args.max_batch_bytes,
+            dead_letters=dead_letters
         )
         
         if success + failed > 0:
@@ -220,6 +499,9 @@ def main():
     except Exception as e:
         print(f"\n\n❌ Error: {e}")
         print("Check embedding_progress.json for current progress")
+    finally:
+        stop_profiling()
+        dead_letters.close()
 
 
 if __name__ == "__main__":
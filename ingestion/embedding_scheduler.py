@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Freshness-priority scheduler for embedding articles.
+Orders pending articles by publish recency and popularity so this week's news
+becomes searchable before the archive, and lets newly created articles jump the queue.
+"""
+
+import heapq
+import json
+import math
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, Optional
+
+import requests
+
+from reconcile_vectors import iter_d1_ids
+
+DEFAULT_RECENCY_WEIGHT = 0.7
+DEFAULT_POPULARITY_WEIGHT = 0.3
+DEFAULT_HALF_LIFE_DAYS = 7.0  # Recency score halves every week
+DEFAULT_FRESH_HOURS = 24.0  # Articles created this recently jump the queue
+FRESH_BOOST = 10.0  # Larger than any weighted score, so fresh articles always go first
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Parse the date formats stored in D1 into an aware UTC datetime, or None."""
+    if not value:
+        return None
+    text = str(value).strip().replace("Z", "+00:00")
+    # D1's datetime('now') uses a space separator, the dataset uses ISO strings
+    for candidate in (text, text.replace(" ", "T", 1)):
+        try:
+            parsed = datetime.fromisoformat(candidate)
+            break
+        except ValueError:
+            continue
+    else:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def load_popularity(popularity_file: Optional[str]) -> Dict[int, float]:
+    """Load {article_id: views/clicks} from a JSON file, or an empty map."""
+    if not popularity_file:
+        return {}
+    with open(popularity_file) as f:
+        raw = json.load(f)
+    return {int(article_id): float(count) for article_id, count in raw.items()}
+
+
+class EmbeddingScheduler:
+    """
+    Priority queue of articles waiting for embeddings.
+
+    priority = recency_weight * 0.5 ** (age_days / half_life_days)
+             + popularity_weight * log1p(popularity) / log1p(max_popularity)
+             + FRESH_BOOST if the article was created within fresh_hours
+    """
+
+    def __init__(self, recency_weight=DEFAULT_RECENCY_WEIGHT, popularity_weight=DEFAULT_POPULARITY_WEIGHT,
+                 half_life_days=DEFAULT_HALF_LIFE_DAYS, fresh_hours=DEFAULT_FRESH_HOURS,
+                 popularity: Optional[Dict[int, float]] = None, now: Optional[datetime] = None):
+        self.recency_weight = recency_weight
+        self.popularity_weight = popularity_weight
+        self.half_life_days = half_life_days
+        self.fresh_hours = fresh_hours
+        self.popularity = popularity or {}
+        self.max_popularity = max(self.popularity.values(), default=0.0)
+        self.now = now
+
+        self._heap = []
+        self._articles = {}
+        self._counter = 0  # Tie-breaker keeps insertion order for equal priorities
+        self.max_seen_id = 0  # Highest D1 id already considered; polls only pick up ids above it
+        self.excluded_ids = set()  # Ids the caller filtered out (e.g. poison); never queued by a poll
+
+    def __len__(self):
+        return len(self._articles)
+
+    def _now(self) -> datetime:
+        return self.now or datetime.now(timezone.utc)
+
+    def priority(self, article: Dict) -> float:
+        """Higher is embedded sooner."""
+        now = self._now()
+
+        recency = 0.0
+        published = parse_timestamp(article.get("published_at"))
+        if published:
+            age_days = max((now - published).total_seconds() / 86400, 0.0)
+            recency = 0.5 ** (age_days / self.half_life_days)
+
+        popularity = 0.0
+        if self.max_popularity > 0:
+            count = self.popularity.get(article.get("id"), 0.0)
+            popularity = math.log1p(count) / math.log1p(self.max_popularity)
+
+        score = self.recency_weight * recency + self.popularity_weight * popularity
+
+        created = parse_timestamp(article.get("created_at"))
+        if created and (now - created).total_seconds() <= self.fresh_hours * 3600:
+            score += FRESH_BOOST
+
+        return score
+
+    def push(self, article: Dict, boost: float = 0.0):
+        """Queue an article (re-pushing an id replaces its entry)."""
+        article_id = article.get("id")
+        self._articles[article_id] = article
+        self._counter += 1
+        heapq.heappush(self._heap, (-(self.priority(article) + boost), self._counter, article_id))
+
+    def pop(self) -> Optional[Dict]:
+        """Remove and return the highest-priority article, or None when empty."""
+        while self._heap:
+            _, _, article_id = heapq.heappop(self._heap)
+            article = self._articles.pop(article_id, None)
+            if article is not None:  # Skip stale entries left behind by re-pushes
+                return article
+        return None
+
+    def sync_watermark(self, api_url: str):
+        """
+        Start polling from the current highest D1 id. Call before draining: the pushed
+        articles may be a subset of the corpus (an ids file, poison filtered out), so their
+        maximum id says nothing about which articles are new.
+        """
+        ids = list(iter_d1_ids(api_url, after_id=self.max_seen_id))
+        if ids:
+            self.max_seen_id = ids[-1]
+
+    def exclude(self, article_ids: Iterable[int]):
+        """Never queue these ids from a poll."""
+        self.excluded_ids.update(article_ids)
+
+    def poll_new_articles(self, api_url: str) -> int:
+        """Queue articles created since the last poll, ahead of everything else."""
+        new_ids = list(iter_d1_ids(api_url, after_id=self.max_seen_id))
+        if new_ids:
+            self.max_seen_id = new_ids[-1]
+
+        added = 0
+        for article_id in new_ids:
+            if article_id in self.excluded_ids:
+                continue
+            response = requests.get(f"{api_url}/articles/{article_id}", timeout=30)
+            if response.status_code == 200:
+                self.push(response.json(), boost=FRESH_BOOST)
+                added += 1
+        return added
+
+    def drain(self, api_url: Optional[str] = None, poll_every: int = 0) -> Iterator[Dict]:
+        """
+        Yield articles in priority order until the queue is empty.
+        With api_url and poll_every > 0, checks for newly created articles every poll_every pops.
+        """
+        popped = 0
+        while True:
+            if api_url and poll_every > 0 and popped > 0 and popped % poll_every == 0:
+                try:
+                    added = self.poll_new_articles(api_url)
+                    if added:
+                        print(f"  Scheduler: {added} new articles jumped the queue")
+                except Exception as e:
+                    print(f"  Scheduler: could not poll for new articles: {e}")
+
+            article = self.pop()
+            if article is None:
+                return
+            popped += 1
+            yield article
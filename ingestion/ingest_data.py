@@ -9,12 +9,14 @@ import pandas as pd
 import requests
 from io import BytesIO
 import json
-import time
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import argparse
 
+from profiling import phase, profiled_sleep, profiled_iter, start_profiling, stop_profiling, DEFAULT_OUTPUT_DIR
+from dead_letter import DeadLetterStore, DEFAULT_DB_PATH, KIND_INSERT, KIND_EMBED
+
 # Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8787")  # Update with your Worker URL
 BATCH_SIZE = 50  # Process articles in batches
@@ -46,10 +48,12 @@ def download_dataset(num_samples: int = 5000) -> pd.DataFrame:
     for i, url in enumerate(PARQUET_FILES):
         try:
             print(f"  Downloading file {i+1}/{len(PARQUET_FILES)}: {url}")
-            r = requests.get(url, timeout=60)
-            r.raise_for_status()
+            with phase("network"):
+                r = requests.get(url, timeout=60)
+                r.raise_for_status()
             
-            df = pd.read_parquet(BytesIO(r.content))
+            with phase("parquet_decode"):
+                df = pd.read_parquet(BytesIO(r.content))
             dfs.append(df)
             print(f"    Loaded {len(df)} rows")
         except Exception as e:
@@ -60,13 +64,15 @@ def download_dataset(num_samples: int = 5000) -> pd.DataFrame:
         raise Exception("No data files downloaded successfully")
     
     print(f"\nCombining {len(dfs)} dataframes...")
-    combined_df = pd.concat(dfs, ignore_index=True)
+    with phase("dataframe"):
+        combined_df = pd.concat(dfs, ignore_index=True)
     print(f"Total rows: {len(combined_df)}")
     
     # Sample the requested number of rows
     if len(combined_df) > num_samples:
         print(f"Sampling {num_samples} rows...")
-        sample_df = combined_df.sample(n=num_samples, random_state=42).reset_index(drop=True)
+        with phase("dataframe"):
+            sample_df = combined_df.sample(n=num_samples, random_state=42).reset_index(drop=True)
     else:
         print(f"Using all {len(combined_df)} rows (less than requested {num_samples})")
         sample_df = combined_df
@@ -153,7 +159,7 @@ def transform_article(row: pd.Series) -> Dict:
     return article
 
 
-def insert_article(article: Dict, api_url: str) -> Optional[Dict]:
+def insert_article(article: Dict, api_url: str) -> Tuple[Optional[Dict], Optional[str]]:
     """
     Insert an article into D1 via the Workers API.
     
@@ -162,23 +168,55 @@ def insert_article(article: Dict, api_url: str) -> Optional[Dict]:
         api_url: Base URL of the Workers API
         
     Returns:
-        Created article with ID, or None if failed
+        (created article with ID, None), or (None, error message) if failed
     """
     try:
-        response = requests.post(
-            f"{api_url}/articles",
-            json=article,
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()
+        with phase("json_serialize"):
+            payload = json.dumps(article)
+        with phase("network"):
+            response = requests.post(
+                f"{api_url}/articles",
+                data=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=30
+            )
+            response.raise_for_status()
+            return response.json(), None
     except Exception as e:
         print(f"    Error inserting article '{article.get('title', 'Unknown')}': {e}")
-        return None
+        return None, str(e)
 
 
-def generate_embedding(article_id: int, article: Dict, api_url: str) -> bool:
+def find_existing_article(article: Dict, api_url: str) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Look up a stored article with the same title, publish date and author.
+    Used before re-inserting: an insert that timed out may still have committed.
+    
+    Args:
+        article: Article data dictionary
+        api_url: Base URL of the Workers API
+    
+    Returns:
+        (stored article or None, None), or (None, error message) if the lookup failed
+    """
+    params = {"title": article.get("title")}
+    if article.get("published_at"):
+        params["published_at"] = article["published_at"]
+    try:
+        with phase("network"):
+            response = requests.get(f"{api_url}/articles", params=params, timeout=30)
+            response.raise_for_status()
+        with phase("json_decode"):
+            matches = response.json()
+    except Exception as e:
+        return None, f"Lookup failed: {e}"
+    for match in matches:
+        if (match.get("author") or None) == (article.get("author") or None):
+            return match, None
+    return None, None
+
+
+def generate_embedding(article_id: int, article: Dict, api_url: str) -> Tuple[bool, Optional[str]]:
     """
     Generate and store embedding for an article with retry logic.
     
@@ -188,45 +226,51 @@ def generate_embedding(article_id: int, article: Dict, api_url: str) -> bool:
         api_url: Base URL of the Workers API
         
     Returns:
-        True if successful, False otherwise
+        (True, None) if successful, (False, error message) otherwise
     """
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.post(
-                f"{api_url}/embed",
-                json={
+            with phase("json_serialize"):
+                payload = json.dumps({
                     "text": article["content"],
                     "article_id": article_id,
                     "title": article["title"],
                     "tags": article["tags"],
                     "published_at": article["published_at"],
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=60
-            )
-            response.raise_for_status()
-            return True
+                    "author": article["author"],
+                    "updated_at": article.get("updated_at"),
+                })
+            with phase("network"):
+                response = requests.post(
+                    f"{api_url}/embed",
+                    data=payload,
+                    headers={"Content-Type": "application/json"},
+                    timeout=60
+                )
+                response.raise_for_status()
+            return True, None
         except requests.exceptions.HTTPError as e:
             # Check if it's a rate limit error (429 or 500 from Workers AI)
             if e.response.status_code in [429, 500]:
                 retry_delay = (2 ** attempt) * EMBEDDING_DELAY  # Exponential backoff
                 if attempt < MAX_RETRIES - 1:
                     print(f"    Rate limit hit for article {article_id}, retrying in {retry_delay:.1f}s (attempt {attempt + 1}/{MAX_RETRIES})")
-                    time.sleep(retry_delay)
+                    profiled_sleep(retry_delay)
                     continue
                 else:
                     print(f"    Failed to generate embedding for article {article_id} after {MAX_RETRIES} attempts")
-                    return False
+                    return False, f"Rate limit after {MAX_RETRIES} attempts"
             else:
                 print(f"    Error generating embedding for article {article_id}: {e}")
-                return False
+                return False, str(e)
         except Exception as e:
             print(f"    Error generating embedding for article {article_id}: {e}")
-            return False
-    return False
+            return False, str(e)
+    return False, "Max retries exceeded"
 
 
-def ingest_articles(df: pd.DataFrame, api_url: str, skip_embeddings: bool = False):
+def ingest_articles(df: pd.DataFrame, api_url: str, skip_embeddings: bool = False,
+                    dead_letters: Optional[DeadLetterStore] = None):
     """
     Ingest articles into D1 and generate embeddings.
     
@@ -234,6 +278,7 @@ def ingest_articles(df: pd.DataFrame, api_url: str, skip_embeddings: bool = Fals
         df: DataFrame with articles
         api_url: Base URL of the Workers API
         skip_embeddings: If True, skip embedding generation
+        dead_letters: Store that failed inserts and embeddings are recorded in for later retry
     """
     print(f"\nIngesting {len(df)} articles...")
     
@@ -242,21 +287,24 @@ def ingest_articles(df: pd.DataFrame, api_url: str, skip_embeddings: bool = Fals
     failed_inserts = 0
     failed_embeddings = 0
     
-    for idx, row in df.iterrows():
+    for idx, row in profiled_iter(df.iterrows(), "iterrows"):
         if (idx + 1) % 100 == 0:
             print(f"  Progress: {idx + 1}/{len(df)} articles processed")
         
         # Transform article
-        article = transform_article(row)
+        with phase("transform"):
+            article = transform_article(row)
         if not article:
             print(f"  Skipping row {idx + 1}: Invalid article data")
             continue
         
         # Insert into D1
-        created_article = insert_article(article, api_url)
+        created_article, error = insert_article(article, api_url)
         if not created_article:
             failed_inserts += 1
-            time.sleep(DELAY_BETWEEN_REQUESTS)
+            if dead_letters is not None:
+                dead_letters.record(KIND_INSERT, article, error)
+            profiled_sleep(DELAY_BETWEEN_REQUESTS)
             continue
         
         successful_inserts += 1
@@ -264,20 +312,25 @@ def ingest_articles(df: pd.DataFrame, api_url: str, skip_embeddings: bool = Fals
         
         if not article_id:
             print(f"    Warning: Article created but no ID returned")
-            time.sleep(DELAY_BETWEEN_REQUESTS)
+            profiled_sleep(DELAY_BETWEEN_REQUESTS)
             continue
         
         # Generate embedding (unless skipped)
         if not skip_embeddings:
-            if generate_embedding(article_id, article, api_url):
+            # updated_at lets the Worker skip the write if the article was edited meanwhile
+            article = {**article, "updated_at": created_article.get("updated_at")}
+            embedded, error = generate_embedding(article_id, article, api_url)
+            if embedded:
                 successful_embeddings += 1
             else:
                 failed_embeddings += 1
+                if dead_letters is not None:
+                    dead_letters.record(KIND_EMBED, {**article, "id": article_id}, error)
             # Use longer delay for embeddings to avoid rate limits
-            time.sleep(EMBEDDING_DELAY)
+            profiled_sleep(EMBEDDING_DELAY)
         else:
             print(f"    Skipping embedding generation (article ID: {article_id})")
-            time.sleep(DELAY_BETWEEN_REQUESTS)
+            profiled_sleep(DELAY_BETWEEN_REQUESTS)
     
     print(f"\n{'='*60}")
     print(f"Ingestion Summary:")
@@ -286,6 +339,8 @@ def ingest_articles(df: pd.DataFrame, api_url: str, skip_embeddings: bool = Fals
     if not skip_embeddings:
         print(f"  Successful embeddings: {successful_embeddings}")
         print(f"  Failed embeddings: {failed_embeddings}")
+    if dead_letters is not None and (failed_inserts or failed_embeddings):
+        print(f"  Failures queued in {dead_letters.path} (retry with: python dead_letter.py retry)")
     print(f"{'='*60}")
 
 
@@ -301,9 +356,10 @@ def verify_articles(api_url: str, num_articles: int = 5):
     
     try:
         # Get all articles
-        response = requests.get(f"{api_url}/articles", timeout=30)
-        response.raise_for_status()
-        articles = response.json()
+        with phase("network"):
+            response = requests.get(f"{api_url}/articles", timeout=30)
+            response.raise_for_status()
+            articles = response.json()
         
         if not articles:
             print("  No articles found in database")
@@ -327,14 +383,15 @@ def verify_articles(api_url: str, num_articles: int = 5):
         
         # Test search
         print(f"\n  Testing search functionality...")
-        search_response = requests.post(
-            f"{api_url}/search",
-            json={"query": "artificial intelligence", "topK": 3},
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
-        search_response.raise_for_status()
-        search_results = search_response.json()
+        with phase("network"):
+            search_response = requests.post(
+                f"{api_url}/search",
+                json={"query": "artificial intelligence", "topK": 3},
+                headers={"Content-Type": "application/json"},
+                timeout=30
+            )
+            search_response.raise_for_status()
+            search_results = search_response.json()
         
         print(f"    Search query: 'artificial intelligence'")
         print(f"    Results found: {search_results.get('count', 0)}")
@@ -380,9 +437,33 @@ def main():
         default=0,
         help="Preview N transformed articles before ingesting (0 = no preview)"
     )
+    parser.add_argument(
+        "--dead-letter-db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help=f"Record failed inserts and embeddings here for dead_letter.py to retry (default: {DEFAULT_DB_PATH})"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=DEFAULT_OUTPUT_DIR,
+        default=None,
+        metavar="DIR",
+        help=f"Profile the run (CPU samples, allocations, time split) and write reports to DIR (default: {DEFAULT_OUTPUT_DIR})"
+    )
     
     args = parser.parse_args()
     
+    if args.profile:
+        start_profiling(args.profile)
+    try:
+        run(args)
+    finally:
+        stop_profiling()
+
+
+def run(args):
+    """Run ingestion with parsed command-line arguments."""
     print("="*60)
     print("NovaNewz Data Ingestion Script")
     print("="*60)
@@ -434,15 +515,18 @@ def main():
             return
     
     # Ingest articles
+    dead_letters = DeadLetterStore(args.dead_letter_db)
     try:
-        ingest_articles(df, args.api_url, skip_embeddings=args.skip_embeddings)
+        ingest_articles(df, args.api_url, skip_embeddings=args.skip_embeddings, dead_letters=dead_letters)
     except Exception as e:
         print(f"Error during ingestion: {e}")
         return
+    finally:
+        dead_letters.close()
     
     # Verify
     if not args.skip_embeddings:
-        time.sleep(2)  # Wait a bit for embeddings to be processed
+        profiled_sleep(2)  # Wait a bit for embeddings to be processed
         verify_articles(args.api_url)
     
     print("\nIngestion complete!")
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for the NovaNewz read API.
+Replays a weighted mix of /search, /history and GET /articles/{id} at fixed Poisson
+arrival rates, records latency histograms, and sweeps rates to find the saturation point.
+
+Open loop: requests are sent on schedule whether or not earlier ones finished, and latency
+is measured from the scheduled send time, so server-side queueing is not hidden.
+"""
+
+import aiohttp
+import asyncio
+import requests
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+DEFAULT_MIX = "search=0.6,article=0.3,history=0.1"
+DEFAULT_RATES = "1,2,5,10,20"
+
+SEARCH_QUERIES = [
+    "artificial intelligence",
+    "OpenAI",
+    "electric vehicles",
+    "cybersecurity breach",
+    "semiconductor",
+    "cloud computing",
+    "Apple",
+    "Nvidia",
+    "layoffs",
+    "cryptocurrency",
+]
+SEARCH_MODES = ["vector", "hybrid", "auto"]
+HISTORY_QUERIES = SEARCH_QUERIES[:5]
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of microsecond latencies.
+    Each power of two is split into 2**precision_bits sub-buckets, so every recorded value
+    is kept to within 1 / 2**precision_bits relative error (0.1% at the default 10 bits).
+    """
+
+    def __init__(self, precision_bits=10):
+        self.precision_bits = precision_bits
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def _bucket(self, value):
+        shift = max(value.bit_length() - self.precision_bits - 1, 0)
+        return shift, value >> shift
+
+    def record(self, seconds):
+        value = max(int(seconds * 1_000_000), 1)
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """Latency in milliseconds at quantile q (0-100)."""
+        if not self.total:
+            return None
+        target = max(int(round(q / 100 * self.total)), 1)
+        seen = 0
+        for shift, sub in sorted(self.counts, key=lambda b: b[1] << b[0]):
+            seen += self.counts[(shift, sub)]
+            if seen >= target:
+                # Upper edge of the bucket, so percentiles never understate latency
+                return (((sub + 1) << shift) - 1) / 1000
+        return self.max / 1000
+
+    def summary(self):
+        return {
+            "count": self.total,
+            "mean_ms": self.sum / self.total / 1000 if self.total else None,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "p999_ms": self.percentile(99.9),
+            "max_ms": self.max / 1000 if self.total else None,
+        }
+
+
+def parse_mix(value):
+    """Parse 'search=0.6,article=0.3,history=0.1' into {endpoint: weight}."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("search", "article", "history"):
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}' (use search, article, history)")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def fetch_article_ids(api_url, limit=1000):
+    """Get a page of real article ids so GET /articles/{id} hits existing rows."""
+    response = requests.get(f"{api_url}/articles", params={"fields": "id", "limit": limit}, timeout=30)
+    response.raise_for_status()
+    return response.json()["ids"]
+
+
+def build_request(endpoint, api_url, article_ids, rng):
+    """Pick concrete (name, method, url, json body) for one request of the given endpoint."""
+    if endpoint == "search":
+        body = {"query": rng.choice(SEARCH_QUERIES), "topK": 10, "mode": rng.choice(SEARCH_MODES)}
+        return "search", "POST", f"{api_url}/search", body
+    if endpoint == "history":
+        return "history", "POST", f"{api_url}/history", {"query": rng.choice(HISTORY_QUERIES)}
+    return "article", "GET", f"{api_url}/articles/{rng.choice(article_ids)}", None
+
+
+class StepResult:
+    """Latency and error accounting for one offered rate."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.overall = LatencyHistogram()
+        self.by_endpoint = {}
+        self.errors = 0
+        self.rate_limited = 0
+        self.dropped = 0
+        self.sent = 0
+        self.duration = 0.0
+
+    def record(self, endpoint, latency, status):
+        self.overall.record(latency)
+        self.by_endpoint.setdefault(endpoint, LatencyHistogram()).record(latency)
+        if status == 429:
+            self.rate_limited += 1
+        elif status is None or status >= 400:
+            self.errors += 1
+
+    def to_dict(self):
+        completed = self.overall.total
+        return {
+            "offered_rps": self.rate,
+            "achieved_rps": completed / self.duration if self.duration else 0.0,
+            "sent": self.sent,
+            "completed": completed,
+            "errors": self.errors,
+            "rate_limited_429": self.rate_limited,
+            "dropped_over_inflight_cap": self.dropped,
+            "latency": self.overall.summary(),
+            "by_endpoint": {name: hist.summary() for name, hist in self.by_endpoint.items()},
+        }
+
+
+async def send(session, result, endpoint, method, url, body, scheduled, timeout):
+    status = None
+    try:
+        async with session.request(method, url, json=body, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            await response.read()
+            status = response.status
+    except Exception:
+        status = None
+    # Measured from the scheduled time, not the actual send time (no coordinated omission)
+    result.record(endpoint, time.perf_counter() - scheduled, status)
+
+
+async def run_step(api_url, rate, duration, mix, article_ids, max_inflight, timeout, seed):
+    """Offer `rate` requests/second for `duration` seconds with Poisson arrivals."""
+    rng = random.Random(seed)
+    endpoints = list(mix)
+    weights = [mix[e] for e in endpoints]
+    result = StepResult(rate)
+    tasks = set()
+
+    connector = aiohttp.TCPConnector(limit=max_inflight)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        scheduled = start
+        while True:
+            scheduled += rng.expovariate(rate)
+            if scheduled - start >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if len(tasks) >= max_inflight:
+                result.dropped += 1
+                continue
+
+            endpoint = rng.choices(endpoints, weights)[0]
+            name, method, url, body = build_request(endpoint, api_url, article_ids, rng)
+            task = asyncio.create_task(send(session, result, name, method, url, body, scheduled, timeout))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            result.sent += 1
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        result.duration = time.perf_counter() - start
+
+    return result
+
+
+def find_saturation(steps, throughput_ratio=0.9, latency_factor=3.0):
+    """
+    Highest offered rate the API still kept up with: achieved throughput within
+    throughput_ratio of offered, and p99 within latency_factor of the lowest-rate p99.
+    """
+    if not steps:
+        return None
+    baseline_p99 = steps[0]["latency"]["p99_ms"] or 0
+    sustained = None
+    for step in steps:
+        p99 = step["latency"]["p99_ms"] or float("inf")
+        keeps_up = step["achieved_rps"] >= throughput_ratio * step["offered_rps"]
+        latency_ok = baseline_p99 == 0 or p99 <= latency_factor * baseline_p99
+        clean = step["errors"] == 0 and step["rate_limited_429"] == 0 and step["dropped_over_inflight_cap"] == 0
+        if keeps_up and latency_ok and clean:
+            sustained = step["offered_rps"]
+        else:
+            break
+    return sustained
+
+
+def print_curve(steps):
+    print("\n" + "=" * 78)
+    print("Latency vs Throughput")
+    print("=" * 78)
+    print(f"{'Offered':>8} {'Achieved':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} "
+          f"{'Errors':>7} {'429s':>6} {'Dropped':>8}")
+    for step in steps:
+        lat = step["latency"]
+
+        def fmt(v):
+            return f"{v:9.1f}" if v is not None else f"{'-':>9}"
+
+        print(f"{step['offered_rps']:8.1f} {step['achieved_rps']:9.1f} {fmt(lat['p50_ms'])} {fmt(lat['p90_ms'])} "
+              f"{fmt(lat['p99_ms'])} {fmt(lat['p999_ms'])} {step['errors']:7d} {step['rate_limited_429']:6d} "
+              f"{step['dropped_over_inflight_cap']:8d}")
+    print("=" * 78)
+
+
+async def sweep(api_url, rates, duration, mix, max_inflight, timeout, cooldown, seed):
+    article_ids = fetch_article_ids(api_url) if mix.get("article") else []
+    if mix.get("article") and not article_ids:
+        raise Exception("No articles found for GET /articles/{id} traffic")
+
+    steps = []
+    for i, rate in enumerate(rates):
+        print(f"\nOffering {rate} req/s for {duration}s...")
+        result = await run_step(api_url, rate, duration, mix, article_ids, max_inflight, timeout, seed + i)
+        step = result.to_dict()
+        steps.append(step)
+        print(f"  achieved {step['achieved_rps']:.1f} req/s, p99 {step['latency']['p99_ms']} ms, "
+              f"{step['errors']} errors, {step['rate_limited_429']} 429s")
+        if i < len(rates) - 1:
+            await asyncio.sleep(cooldown)
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for the NovaNewz read API")
+    parser.add_argument(
+        "--api-url",
+        type=str,
+        default=os.getenv("API_BASE_URL", "http://localhost:8787"),
+        help="Base URL of the Workers API"
+    )
+    parser.add_argument(
+        "--rates",
+        type=str,
+        default=DEFAULT_RATES,
+        help=f"Comma-separated arrival rates in requests/second to sweep (default: {DEFAULT_RATES})"
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=30.0,
+        help="Seconds to hold each rate (default: 30)"
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix(DEFAULT_MIX),
+        help=f"Weighted endpoint mix (default: {DEFAULT_MIX})"
+    )
+    parser.add_argument(
+        "--max-inflight",
+        type=int,
+        default=500,
+        help="Safety cap on concurrent requests; arrivals over the cap are counted as dropped (default: 500)"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60.0,
+        help="Per-request timeout in seconds (default: 60)"
+    )
+    parser.add_argument(
+        "--cooldown",
+        type=float,
+        default=5.0,
+        help="Seconds to pause between rates (default: 5)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Random seed for arrivals and query choice (default: 42)"
+    )
+
+    args = parser.parse_args()
+    rates = [float(r) for r in args.rates.split(",")]
+
+    print("=" * 60)
+    print("NovaNewz - Open-Loop Load Test")
+    print("=" * 60)
+    print(f"API URL: {args.api_url}")
+    print(f"Rates: {rates} req/s, {args.duration}s each")
+    print(f"Mix: {args.mix}")
+    print("=" * 60)
+
+    try:
+        steps = asyncio.run(sweep(args.api_url, rates, args.duration, args.mix,
+                                  args.max_inflight, args.timeout, args.cooldown, args.seed))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+        return
+
+    print_curve(steps)
+    saturation = find_saturation(steps)
+    if saturation is None:
+        print("\nThe API did not keep up even at the lowest rate")
+    elif saturation == steps[-1]["offered_rps"]:
+        print(f"\nNo saturation up to {saturation} req/s; try higher rates")
+    else:
+        print(f"\nSaturation point: ~{saturation} req/s (last rate sustained without errors or latency blow-up)")
+
+    with open("load_test_report.json", "w") as f:
+        json.dump({
+            "completed_at": datetime.now().isoformat(),
+            "api_url": args.api_url,
+            "mix": args.mix,
+            "steps": steps,
+            "saturation_rps": saturation,
+        }, f, indent=2)
+    print("Full report saved to load_test_report.json")
+
+
+if __name__ == "__main__":
+    main()
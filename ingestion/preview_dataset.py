@@ -1,33 +1,61 @@
 #!/usr/bin/env python3
 """
-Simple dataset preview script - no API required.
-Use this to explore the dataset before ingesting.
+Dataset preview and profiling script - no API required.
+Use this to explore the dataset before ingesting:
+
+  python preview_dataset.py [N]     Show N random articles from the first shard
+  python preview_dataset.py --stats Stream every shard and compute corpus statistics
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import requests
 from io import BytesIO
+import argparse
+import hashlib
+import heapq
 import json
+import math
+import os
+import tempfile
+
+from ingest_data import transform_article
+
+DATASET_API = "https://huggingface.co/api/datasets/AIatMongoDB/tech-news-embeddings/parquet/default/train"
+SHARD_URL = DATASET_API + "/{index:04d}.parquet"
+
+BATCH_ROWS = 4096  # Rows decoded at a time; bounds memory regardless of shard size
+DOWNLOAD_CHUNK = 1 << 20  # Stream shards to disk 1 MiB at a time
+TOP_COMPANIES = 20
+
+# Columns transform_article may read; the large embedding column is never decoded
+TRANSFORM_COLUMNS = [
+    "title", "description", "content", "text", "companyName", "author",
+    "published_at", "date", "timestamp", "tags", "category", "categories",
+]
+
 
 def preview_dataset(num_samples=10):
     """Download and preview the dataset."""
     print("Downloading sample from Hugging Face...")
     print("=" * 60)
-    
-    url = "https://huggingface.co/api/datasets/AIatMongoDB/tech-news-embeddings/parquet/default/train/0000.parquet"
-    
+
+    url = SHARD_URL.format(index=0)
+
     try:
         r = requests.get(url, timeout=60)
         r.raise_for_status()
         df = pd.read_parquet(BytesIO(r.content))
-        
+
         print(f"✓ Downloaded {len(df)} articles")
         print(f"\nColumns: {df.columns.tolist()}")
         print(f"\nShowing {num_samples} random samples:")
         print("=" * 60)
-        
+
         sample_df = df.sample(n=min(num_samples, len(df)))
-        
+
         for idx, (_, row) in enumerate(sample_df.iterrows(), 1):
             print(f"\n{idx}. {row['title']}")
             print(f"   Company: {row['companyName']}")
@@ -35,22 +63,301 @@ def preview_dataset(num_samples=10):
             print(f"   Description: {row['description'][:150]}...")
             if 'url' in row:
                 print(f"   URL: {row['url']}")
-        
+
         print("\n" + "=" * 60)
-        print(f"\nDataset Statistics:")
-        print(f"  Total articles: {len(df)}")
-        print(f"  Date range: {df['published_at'].min()} to {df['published_at'].max()}")
-        print(f"  Unique companies: {df['companyName'].nunique()}")
-        print(f"\nTop 10 companies by article count:")
-        print(df['companyName'].value_counts().head(10))
-        
+        print("Run with --stats for statistics over every shard")
+
     except Exception as e:
         print(f"✗ Error: {e}")
         return False
-    
+
     return True
 
+
+# ---------------------------------------------------------------------------
+# Streaming corpus statistics
+# ---------------------------------------------------------------------------
+
+def _hash(value, seed=0):
+    digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8, salt=seed.to_bytes(8, "little"))
+    return int.from_bytes(digest.digest(), "little")
+
+
+class CountMinSketch:
+    """Fixed-size frequency sketch: estimates never undercount, overcount by ~e/width of the total."""
+
+    def __init__(self, width=4096, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = [[0] * width for _ in range(depth)]
+
+    def add(self, value, count=1):
+        estimate = None
+        for row in range(self.depth):
+            col = _hash(value, row) % self.width
+            self.table[row][col] += count
+            cell = self.table[row][col]
+            estimate = cell if estimate is None else min(estimate, cell)
+        return estimate
+
+
+class HeavyHitters:
+    """Top-k values by count-min estimate, tracking at most `capacity` candidates."""
+
+    def __init__(self, k=TOP_COMPANIES, capacity=None):
+        self.k = k
+        self.capacity = capacity or k * 10
+        self.sketch = CountMinSketch()
+        self.candidates = {}
+
+    def add(self, value, count=1):
+        estimate = self.sketch.add(value, count)
+        if value in self.candidates or len(self.candidates) < self.capacity:
+            self.candidates[value] = estimate
+            return
+        weakest = min(self.candidates, key=self.candidates.get)
+        if estimate > self.candidates[weakest]:
+            del self.candidates[weakest]
+            self.candidates[value] = estimate
+
+    def top(self):
+        return heapq.nlargest(self.k, self.candidates.items(), key=lambda kv: kv[1])
+
+
+class HyperLogLog:
+    """Approximate distinct count in 2**p registers (~1.6% error at p=12)."""
+
+    def __init__(self, p=12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = [0] * self.m
+
+    def add(self, value):
+        h = _hash(value)
+        index = h & (self.m - 1)
+        rest = h >> self.p
+        rank = (64 - self.p) - rest.bit_length() + 1
+        self.registers[index] = max(self.registers[index], rank)
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)  # Small-range correction
+        return int(round(estimate))
+
+
+class LengthHistogram:
+    """Power-of-two histogram of string lengths plus count/min/max/mean."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add_array(self, array):
+        lengths = pc.utf8_length(array).drop_null()
+        if len(lengths) == 0:
+            return
+        self.count += len(lengths)
+        self.total += pc.sum(lengths).as_py()
+        bounds = pc.min_max(lengths)
+        low, high = bounds["min"].as_py(), bounds["max"].as_py()
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+        # Bucket b holds lengths in [2**(b-1), 2**b), bucket 0 holds empty strings
+        buckets = pc.ceil(pc.log2(pc.add(pc.cast(lengths, pa.float64()), 1.0)))
+        for entry in pc.value_counts(buckets).to_pylist():
+            bucket = int(entry["values"])
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + entry["counts"]
+
+    def to_dict(self):
+        rows = []
+        for bucket in sorted(self.buckets):
+            low = 0 if bucket == 0 else 2 ** (bucket - 1)
+            rows.append({"min_length": low, "max_length": 2 ** bucket - 1, "count": self.buckets[bucket]})
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.total / self.count if self.count else None,
+            "histogram": rows,
+        }
+
+
+class DatasetProfile:
+    """Accumulates every statistic incrementally, one record batch at a time."""
+
+    def __init__(self):
+        self.rows = 0
+        self.shards = 0
+        self.nulls = {}
+        self.description_lengths = LengthHistogram()
+        self.date_min = None
+        self.date_max = None
+        self.companies = HeavyHitters()
+        self.distinct_companies = HyperLogLog()
+        self.transform_checked = 0
+        self.transform_rejected = 0
+
+    def add_metadata(self, metadata):
+        """Null counts come from parquet column statistics, so no column data is decoded."""
+        for rg in range(metadata.num_row_groups):
+            row_group = metadata.row_group(rg)
+            for c in range(row_group.num_columns):
+                column = row_group.column(c)
+                name = column.path_in_schema.split(".")[0]
+                stats = column.statistics
+                entry = self.nulls.setdefault(name, {"nulls": 0, "known": True})
+                if stats is not None and stats.has_null_count:
+                    entry["nulls"] += stats.null_count
+                else:
+                    entry["known"] = False
+
+    def add_batch(self, batch):
+        self.rows += batch.num_rows
+        names = batch.schema.names
+
+        if "description" in names:
+            self.description_lengths.add_array(batch.column("description"))
+
+        if "published_at" in names:
+            dates = batch.column("published_at").drop_null()
+            if len(dates) > 0:
+                bounds = pc.min_max(dates)
+                low, high = bounds["min"].as_py(), bounds["max"].as_py()
+                self.date_min = low if self.date_min is None else min(self.date_min, low)
+                self.date_max = high if self.date_max is None else max(self.date_max, high)
+
+        if "companyName" in names:
+            for entry in pc.value_counts(batch.column("companyName").drop_null()).to_pylist():
+                self.companies.add(entry["values"], entry["counts"])
+                self.distinct_companies.add(entry["values"])
+
+        for row in batch.to_pylist():
+            self.transform_checked += 1
+            if transform_article(row) is None:
+                self.transform_rejected += 1
+
+    def to_dict(self):
+        return {
+            "shards": self.shards,
+            "rows": self.rows,
+            "null_rates": {
+                name: (entry["nulls"] / self.rows if self.rows and entry["known"] else None)
+                for name, entry in self.nulls.items()
+            },
+            "description_length": self.description_lengths.to_dict(),
+            "published_at_range": [str(self.date_min), str(self.date_max)],
+            "distinct_companies_estimate": self.distinct_companies.count(),
+            "top_companies": [{"company": name, "count_estimate": count} for name, count in self.companies.top()],
+            "transform_rejection_rate": (
+                self.transform_rejected / self.transform_checked if self.transform_checked else None
+            ),
+        }
+
+
+def list_shards():
+    """Ask the Hub for every shard URL, falling back to probing 0000, 0001, ..."""
+    try:
+        response = requests.get(DATASET_API, timeout=30)
+        response.raise_for_status()
+        urls = response.json()
+        if isinstance(urls, list) and urls:
+            return urls
+    except Exception as e:
+        print(f"  Could not list shards ({e}), probing instead")
+
+    urls = []
+    while True:
+        url = SHARD_URL.format(index=len(urls))
+        if requests.head(url, timeout=30, allow_redirects=True).status_code != 200:
+            return urls
+        urls.append(url)
+
+
+def download_shard(url, path):
+    """Stream a shard to disk so it never has to fit in memory."""
+    with requests.get(url, stream=True, timeout=120) as response:
+        response.raise_for_status()
+        with open(path, "wb") as f:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK):
+                f.write(chunk)
+
+
+def profile_dataset(max_shards=None, output_file="dataset_profile.json"):
+    """Stream every shard, decoding only the needed columns batch by batch."""
+    print("Listing dataset shards...")
+    shards = list_shards()
+    if max_shards:
+        shards = shards[:max_shards]
+    print(f"Profiling {len(shards)} shards")
+    print("=" * 60)
+
+    profile = DatasetProfile()
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, url in enumerate(shards, 1):
+            path = os.path.join(tmp, "shard.parquet")
+            print(f"  [{i}/{len(shards)}] {url}")
+            download_shard(url, path)
+
+            parquet = pq.ParquetFile(path)
+            profile.add_metadata(parquet.metadata)
+            columns = [c for c in TRANSFORM_COLUMNS if c in parquet.schema_arrow.names]
+            for batch in parquet.iter_batches(batch_size=BATCH_ROWS, columns=columns):
+                profile.add_batch(batch)
+
+            profile.shards += 1
+            os.remove(path)
+            print(f"      {profile.rows} rows so far")
+
+    report = profile.to_dict()
+    print_report(report)
+    with open(output_file, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nFull report saved to {output_file}")
+    return report
+
+
+def print_report(report):
+    print("\n" + "=" * 60)
+    print("Dataset Statistics:")
+    print(f"  Shards: {report['shards']}")
+    print(f"  Total articles: {report['rows']}")
+    print(f"  Date range: {report['published_at_range'][0]} to {report['published_at_range'][1]}")
+    print(f"  Unique companies (estimate): {report['distinct_companies_estimate']}")
+    rejection = report["transform_rejection_rate"]
+    if rejection is not None:
+        print(f"  transform_article rejection rate: {rejection:.1%}")
+
+    print("\nNull rates:")
+    for name, rate in sorted(report["null_rates"].items()):
+        print(f"  {name:<20} {'unknown' if rate is None else f'{rate:.2%}'}")
+
+    lengths = report["description_length"]
+    if lengths["count"]:
+        print(f"\nDescription length: min {lengths['min']}, mean {lengths['mean']:.0f}, max {lengths['max']} chars")
+        for row in lengths["histogram"]:
+            print(f"  {row['min_length']:>7}-{row['max_length']:<7} {row['count']}")
+
+    print(f"\nTop {len(report['top_companies'])} companies by article count (estimated):")
+    for entry in report["top_companies"]:
+        print(f"  {entry['company']:<30} {entry['count_estimate']}")
+
+
 if __name__ == "__main__":
-    import sys
-    num = int(sys.argv[1]) if len(sys.argv) > 1 else 10
-    preview_dataset(num)
+    parser = argparse.ArgumentParser(description="Preview or profile the tech news dataset")
+    parser.add_argument("num", nargs="?", type=int, default=10, help="Articles to preview (default: 10)")
+    parser.add_argument("--stats", action="store_true", help="Stream every shard and compute corpus statistics")
+    parser.add_argument("--max-shards", type=int, default=None, help="Only profile the first N shards")
+    parser.add_argument("--output", type=str, default="dataset_profile.json", help="Where to save the statistics")
+
+    args = parser.parse_args()
+    if args.stats:
+        profile_dataset(args.max_shards, args.output)
+    else:
+        preview_dataset(args.num)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Pre-warm the /history cache for trending queries.
+Run during off-peak hours so users hit cached summaries instead of waiting on Llama.
+"""
+
+import requests
+import time
+import json
+import argparse
+from datetime import datetime
+import os
+
+from time_windows import in_off_peak_window, parse_window
+
+# Queries to warm when no --queries-file is given
+TRENDING_QUERIES = [
+    "artificial intelligence",
+    "OpenAI",
+    "electric vehicles",
+    "cybersecurity breach",
+    "semiconductor shortage",
+    "cloud computing",
+    "cryptocurrency regulation",
+    "layoffs in tech",
+    "smartphone launch",
+    "antitrust lawsuit",
+]
+
+
+def load_queries(queries_file=None):
+    """Load queries from a file (one per line, # for comments) or fall back to the defaults."""
+    if not queries_file:
+        return list(TRENDING_QUERIES)
+
+    with open(queries_file) as f:
+        queries = [line.strip() for line in f]
+    return [q for q in queries if q and not q.startswith("#")]
+
+
+def wait_for_off_peak(start_hour, end_hour, poll_interval=300):
+    """Block until the off-peak window opens."""
+    while not in_off_peak_window(start_hour, end_hour):
+        print(f"Outside off-peak window ({start_hour:02d}:00-{end_hour:02d}:00 UTC), "
+              f"checking again in {poll_interval}s...")
+        time.sleep(poll_interval)
+
+
+def warm_query(query, api_url, refresh=False, max_retries=3, base_delay=5):
+    """Request /history for one query. Returns (cache_status, error)."""
+    for attempt in range(max_retries):
+        try:
+            response = requests.post(
+                f"{api_url}/history",
+                json={"query": query, "refresh": refresh},
+                headers={"Content-Type": "application/json"},
+                timeout=120
+            )
+
+            if response.status_code == 200:
+                return response.headers.get("X-History-Cache", "UNKNOWN"), None
+            elif response.status_code in [429, 500]:  # Rate limit or AI error
+                if attempt < max_retries - 1:
+                    wait_time = base_delay * (2 ** attempt)
+                    print(f"    Rate limit/error, waiting {wait_time}s (attempt {attempt + 1}/{max_retries})...")
+                    time.sleep(wait_time)
+                    continue
+                return None, f"Rate limit after {max_retries} attempts"
+            else:
+                return None, f"HTTP {response.status_code}: {response.text}"
+
+        except requests.exceptions.Timeout:
+            if attempt < max_retries - 1:
+                wait_time = base_delay * (2 ** attempt)
+                print(f"    Timeout, waiting {wait_time}s (attempt {attempt + 1}/{max_retries})...")
+                time.sleep(wait_time)
+                continue
+            return None, "Timeout after retries"
+        except Exception as e:
+            return None, str(e)
+
+    return None, "Max retries exceeded"
+
+
+def prewarm(api_url, queries, delay=5.0, refresh=False, off_peak=None):
+    """Warm the cache for every query, stopping early if the off-peak window closes."""
+    print(f"Pre-warming {len(queries)} queries...")
+    print("=" * 60)
+
+    results = {"HIT": 0, "MISS": 0, "failed": 0}
+    failed_queries = []
+
+    for idx, query in enumerate(queries):
+        if off_peak and not in_off_peak_window(*off_peak):
+            print("\nOff-peak window closed, stopping early")
+            break
+
+        print(f"[{idx + 1}/{len(queries)}] {query}")
+        status, error = warm_query(query, api_url, refresh=refresh, base_delay=delay)
+
+        if error:
+            print(f"  ✗ Failed: {error}")
+            results["failed"] += 1
+            failed_queries.append({"query": query, "error": error})
+        else:
+            print(f"  ✓ {status}")
+            results[status] = results.get(status, 0) + 1
+
+        # Only misses cost a Llama call, but pace everything to stay under rate limits
+        if idx < len(queries) - 1:
+            time.sleep(delay)
+
+    print("\n" + "=" * 60)
+    print("Pre-warm Complete!")
+    print(f"  Already cached: {results['HIT']}")
+    print(f"  Generated: {results['MISS']}")
+    print(f"  Failed: {results['failed']}")
+    print("=" * 60)
+
+    with open("prewarm_report.json", "w") as f:
+        json.dump({
+            "completed_at": datetime.now().isoformat(),
+            "results": results,
+            "failed_queries": failed_queries,
+        }, f, indent=2)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the /history cache for trending queries")
+    parser.add_argument(
+        "--api-url",
+        type=str,
+        default=os.getenv("API_BASE_URL", "http://localhost:8787"),
+        help="Base URL of the Workers API"
+    )
+    parser.add_argument(
+        "--queries-file",
+        type=str,
+        default=None,
+        help="File with one query per line (default: built-in trending list)"
+    )
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=5.0,
+        help="Seconds to wait between queries (default: 5)"
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Regenerate entries even if they are already cached"
+    )
+    parser.add_argument(
+        "--off-peak",
+        type=parse_window,
+        default=None,
+        help="Only run inside this UTC hour window, e.g. '1-6' (waits for it to open)"
+    )
+
+    args = parser.parse_args()
+    queries = load_queries(args.queries_file)
+
+    print("=" * 60)
+    print("NovaNewz - Pre-warm History Cache")
+    print("=" * 60)
+    print(f"API URL: {args.api_url}")
+    print(f"Queries: {len(queries)}")
+    print(f"Refresh: {args.refresh}")
+    if args.off_peak:
+        print(f"Off-peak window: {args.off_peak[0]:02d}:00-{args.off_peak[1]:02d}:00 UTC")
+    print("=" * 60)
+
+    if args.off_peak:
+        wait_for_off_peak(*args.off_peak)
+
+    try:
+        prewarm(args.api_url, queries, delay=args.delay, refresh=args.refresh, off_peak=args.off_peak)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+
+
+if __name__ == "__main__":
+    main()
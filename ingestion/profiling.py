@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Built-in profiling for the ingestion CLIs (--profile).
+Collects sampled CPU stacks, tracemalloc top allocators, and a wall-clock split into
+CPU, network wait and deliberate sleep. Writes a flamegraph-compatible collapsed-stack
+file plus a summary table when the run ends.
+
+Instrumented code calls phase()/profiled_sleep()/profiled_iter(); these are no-ops
+unless start_profiling() has been called.
+"""
+
+import json
+import os
+import signal
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+DEFAULT_OUTPUT_DIR = "profile_output"
+SAMPLE_INTERVAL = 0.005  # Seconds of CPU time between stack samples
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATORS = 15
+
+# Phases whose wall-clock time counts as waiting rather than computing
+NETWORK_PHASE = "network"
+SLEEP_PHASE = "sleep"
+
+_active = None
+
+
+class RunProfiler:
+    """Profiles one CLI run. Use through start_profiling() / stop_profiling()."""
+
+    def __init__(self, output_dir=DEFAULT_OUTPUT_DIR, sample_interval=SAMPLE_INTERVAL):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.samples = Counter()
+        self.phase_wall = defaultdict(float)
+        self.phase_cpu = defaultdict(float)
+        self.phase_calls = Counter()
+        self._stack = []  # Nested phases; time is attributed to the innermost one
+        self.sampling = False
+
+    def start(self):
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+        # SIGPROF fires per interval of CPU time, so idle waits are never sampled
+        if hasattr(signal, "setitimer"):
+            signal.signal(signal.SIGPROF, self._sample)
+            signal.setitimer(signal.ITIMER_PROF, self.sample_interval, self.sample_interval)
+            self.sampling = True
+        else:
+            print("Profiling: CPU sampling needs setitimer (Unix only), collecting timings only")
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        self.samples[";".join(reversed(stack))] += 1
+
+    @contextmanager
+    def phase(self, name):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if self._stack:
+            # Pause the enclosing phase so nested time isn't counted twice
+            parent, parent_wall, parent_cpu = self._stack[-1]
+            self.phase_wall[parent] += wall - parent_wall
+            self.phase_cpu[parent] += cpu - parent_cpu
+        self._stack.append((name, wall, cpu))
+        self.phase_calls[name] += 1
+        try:
+            yield
+        finally:
+            _, start_wall, start_cpu = self._stack.pop()
+            end_wall = time.perf_counter()
+            end_cpu = time.process_time()
+            self.phase_wall[name] += end_wall - start_wall
+            self.phase_cpu[name] += end_cpu - start_cpu
+            if self._stack:
+                parent = self._stack[-1][0]
+                self._stack[-1] = (parent, end_wall, end_cpu)
+
+    def stop(self):
+        if self.sampling:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+        wall_total = time.perf_counter() - self.wall_start
+        cpu_total = time.process_time() - self.cpu_start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        # Collapsed stacks: render with flamegraph.pl, speedscope or inferno
+        stacks_path = os.path.join(self.output_dir, "cpu.collapsed")
+        with open(stacks_path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        # Leave out the profiler's own bookkeeping
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        allocators = snapshot.statistics("lineno")[:TOP_ALLOCATORS]
+
+        network_wall = self.phase_wall[NETWORK_PHASE]
+        network_wait = max(network_wall - self.phase_cpu[NETWORK_PHASE], 0.0)
+        sleep_wall = self.phase_wall[SLEEP_PHASE]
+        summary = {
+            "wall_seconds": wall_total,
+            "cpu_seconds": cpu_total,
+            "network_wait_seconds": network_wait,
+            "sleep_seconds": sleep_wall,
+            "other_wait_seconds": max(wall_total - cpu_total - network_wait - sleep_wall, 0.0),
+            "peak_traced_memory_bytes": peak,
+            "cpu_samples": sum(self.samples.values()),
+            "phases": {
+                name: {
+                    "calls": self.phase_calls[name],
+                    "wall_seconds": self.phase_wall[name],
+                    "cpu_seconds": self.phase_cpu[name],
+                }
+                for name in self.phase_calls
+            },
+            "top_allocators": [
+                {"location": str(stat.traceback[0]), "size_bytes": stat.size, "count": stat.count}
+                for stat in allocators
+            ],
+        }
+        with open(os.path.join(self.output_dir, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+
+        self._print_summary(summary, stacks_path)
+        return summary
+
+    def _print_summary(self, summary, stacks_path):
+        wall = summary["wall_seconds"] or 1e-9
+
+        print("\n" + "=" * 60)
+        print("Profile Summary")
+        print("=" * 60)
+        print(f"  Wall clock:    {summary['wall_seconds']:10.2f}s")
+        for label, key in [("CPU", "cpu_seconds"), ("Network wait", "network_wait_seconds"),
+                           ("Sleep", "sleep_seconds"), ("Other wait", "other_wait_seconds")]:
+            print(f"  {label + ':':<14} {summary[key]:10.2f}s  ({100 * summary[key] / wall:5.1f}%)")
+        print(f"  Peak traced memory: {summary['peak_traced_memory_bytes'] / 1024 / 1024:.1f} MiB")
+
+        print(f"\n  {'Phase':<18} {'Calls':>8} {'Wall (s)':>10} {'CPU (s)':>10}")
+        phases = sorted(summary["phases"].items(), key=lambda kv: kv[1]["wall_seconds"], reverse=True)
+        for name, stats in phases:
+            print(f"  {name:<18} {stats['calls']:>8} {stats['wall_seconds']:>10.2f} {stats['cpu_seconds']:>10.2f}")
+
+        print("\n  Top allocators:")
+        for alloc in summary["top_allocators"][:5]:
+            print(f"    {alloc['size_bytes'] / 1024:10.1f} KiB  {alloc['location']}")
+
+        print(f"\n  CPU samples: {summary['cpu_samples']} -> {stacks_path}")
+        print(f"  Full report: {os.path.join(self.output_dir, 'summary.json')}")
+        print("=" * 60)
+
+
+def start_profiling(output_dir=DEFAULT_OUTPUT_DIR, sample_interval=SAMPLE_INTERVAL):
+    """Start profiling the current run."""
+    global _active
+    _active = RunProfiler(output_dir, sample_interval)
+    _active.start()
+    return _active
+
+
+def stop_profiling():
+    """Stop profiling, write the reports and print the summary. Returns the summary or None."""
+    global _active
+    if _active is None:
+        return None
+    profiler, _active = _active, None
+    return profiler.stop()
+
+
+@contextmanager
+def phase(name):
+    """Attribute the enclosed wall and CPU time to a named phase."""
+    if _active is None:
+        yield
+        return
+    with _active.phase(name):
+        yield
+
+
+def profiled_sleep(seconds):
+    """time.sleep that is reported as deliberate sleep."""
+    with phase(SLEEP_PHASE):
+        time.sleep(seconds)
+
+
+def profiled_iter(iterable, name):
+    """Yield from iterable, attributing the time spent producing each item to a phase."""
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
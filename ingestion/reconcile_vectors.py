@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Reconcile D1 articles with Vectorize vectors.
+Finds orphan vectors (no D1 article) and gaps (articles with no vector),
+deletes orphans in batches and writes the gaps to a queue file for embed_all_articles.py.
+"""
+
+import requests
+import time
+import json
+import argparse
+from datetime import datetime
+import os
+
+PAGE_SIZE = 1000  # Ids per page when streaming from either store
+DELETE_BATCH_SIZE = 1000  # Ids per /vectorize delete request (the Worker splits further)
+QUEUE_FILE = "embedding_queue.json"
+PROBE_MARGIN = 1000  # Ids probed above the highest D1 id when vectors can't be listed
+
+CLOUDFLARE_API = "https://api.cloudflare.com/client/v4"
+
+
+def iter_d1_ids(api_url, page_size=PAGE_SIZE, after_id=0):
+    """Stream every article id above after_id from D1, in id order, using keyset pagination."""
+    while True:
+        response = requests.get(
+            f"{api_url}/articles",
+            params={"fields": "id", "after_id": after_id, "limit": page_size},
+            timeout=30
+        )
+        response.raise_for_status()
+        page = response.json()
+
+        yield from page["ids"]
+
+        if page.get("next_after_id") is None:
+            return
+        after_id = page["next_after_id"]
+
+
+def iter_vector_ids_listed(account_id, api_token, index_name, page_size=PAGE_SIZE):
+    """Stream every vector id from the Vectorize REST list endpoint (cursor pagination)."""
+    url = f"{CLOUDFLARE_API}/accounts/{account_id}/vectorize/v2/indexes/{index_name}/list"
+    headers = {"Authorization": f"Bearer {api_token}"}
+    cursor = None
+
+    while True:
+        params = {"count": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        response = requests.get(url, params=params, headers=headers, timeout=30)
+        response.raise_for_status()
+        result = response.json()["result"]
+
+        for vector in result.get("vectors", []):
+            yield vector["id"]
+
+        if not result.get("isTruncated"):
+            return
+        cursor = result.get("nextCursor")
+
+
+def iter_vector_ids_probed(api_url, max_id, page_size=PAGE_SIZE):
+    """
+    Probe article ids 1..max_id through the Worker's /vectorize endpoint.
+    Used when no API token is available.
+    """
+    for start in range(1, max_id + 1, page_size):
+        ids = list(range(start, min(start + page_size, max_id + 1)))
+        response = requests.post(
+            f"{api_url}/vectorize",
+            json={"action": "exists", "ids": ids},
+            headers={"Content-Type": "application/json"},
+            timeout=60
+        )
+        response.raise_for_status()
+        for article_id in response.json()["ids"]:
+            yield f"article_{article_id}"
+
+
+def parse_vector_id(vector_id):
+    """Map a vector id ('article_<id>') back to its article id, or None for foreign ids."""
+    prefix, _, suffix = vector_id.partition("_")
+    if prefix != "article" or not suffix.isdigit():
+        return None
+    return int(suffix)
+
+
+def existing_d1_ids(api_url, article_ids):
+    """Which of the given (sorted) article ids exist in D1 right now."""
+    wanted = set(article_ids)
+    existing = set()
+    for article_id in iter_d1_ids(api_url, after_id=article_ids[0] - 1):
+        if article_id > article_ids[-1]:
+            break
+        if article_id in wanted:
+            existing.add(article_id)
+    return existing
+
+
+def delete_orphans(api_url, orphan_ids, batch_size=DELETE_BATCH_SIZE, delay=0.5):
+    """
+    Delete orphan vectors in batches. Returns the number of ids deleted.
+    Each batch is re-checked against D1 first, so an article created after the id sets
+    were read keeps its vector.
+    """
+    deleted = 0
+    for i in range(0, len(orphan_ids), batch_size):
+        batch = orphan_ids[i:i + batch_size]
+        live = existing_d1_ids(api_url, batch)
+        if live:
+            print(f"  Keeping {len(live)} vectors whose article now exists in D1")
+            batch = [article_id for article_id in batch if article_id not in live]
+        if not batch:
+            continue
+        response = requests.post(
+            f"{api_url}/vectorize",
+            json={"action": "delete", "ids": batch},
+            headers={"Content-Type": "application/json"},
+            timeout=60
+        )
+        response.raise_for_status()
+        deleted += len(batch)
+        print(f"  Deleted {deleted}/{len(orphan_ids)} orphan vectors")
+        if i + batch_size < len(orphan_ids):
+            time.sleep(delay)
+    return deleted
+
+
+def requeue_missing(missing_ids, queue_file=QUEUE_FILE):
+    """Merge missing article ids into the embedding queue file."""
+    queued = set()
+    if os.path.exists(queue_file):
+        with open(queue_file) as f:
+            queued.update(json.load(f).get("ids", []))
+
+    queued.update(missing_ids)
+    with open(queue_file, "w") as f:
+        json.dump({
+            "updated_at": datetime.now().isoformat(),
+            "ids": sorted(queued),
+        }, f, indent=2)
+    return len(queued)
+
+
+def reconcile(api_url, account_id=None, api_token=None, index_name="novanewz-vectors",
+              probe_margin=PROBE_MARGIN, dry_run=False, queue_file=QUEUE_FILE):
+    """Compare both id sets and repair the differences."""
+    print("Streaming article ids from D1...")
+    d1_ids = set(iter_d1_ids(api_url))
+    max_d1_id = max(d1_ids, default=0)
+    print(f"  {len(d1_ids)} articles")
+
+    print("Streaming vector ids from Vectorize...")
+    if account_id and api_token:
+        vector_id_stream = iter_vector_ids_listed(account_id, api_token, index_name)
+    else:
+        # Probe past the highest id too, for vectors of the newest articles that were deleted
+        max_id = max_d1_id + probe_margin
+        print(f"  No API token, probing ids 1..{max_id} through /vectorize")
+        vector_id_stream = iter_vector_ids_probed(api_url, max_id)
+
+    vector_ids = set()
+    foreign = 0
+    for vector_id in vector_id_stream:
+        article_id = parse_vector_id(vector_id)
+        if article_id is None:
+            foreign += 1
+        else:
+            vector_ids.add(article_id)
+    print(f"  {len(vector_ids)} article vectors ({foreign} with unrecognised ids, left alone)")
+
+    # Articles created since D1 was read also look like orphans here; delete_orphans
+    # re-checks every batch against D1 before deleting anything
+    orphans = sorted(vector_ids - d1_ids)
+    missing = sorted(d1_ids - vector_ids)
+
+    print("\n" + "=" * 60)
+    print("Reconciliation Summary:")
+    print(f"  Orphan vectors (no article): {len(orphans)}")
+    print(f"  Articles without a vector: {len(missing)}")
+    print("=" * 60)
+
+    if dry_run:
+        print("\nDry run, nothing changed")
+        return orphans, missing
+
+    if orphans:
+        print(f"\nDeleting {len(orphans)} orphan vectors...")
+        delete_orphans(api_url, orphans)
+
+    if missing:
+        total = requeue_missing(missing, queue_file)
+        print(f"\nQueued {len(missing)} articles for embedding ({total} in {queue_file})")
+        print(f"Embed them with: python embed_all_articles.py --api-url {api_url} --ids-file {queue_file}")
+
+    return orphans, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile D1 articles with Vectorize vectors")
+    parser.add_argument(
+        "--api-url",
+        type=str,
+        default=os.getenv("API_BASE_URL", "http://localhost:8787"),
+        help="Base URL of the Workers API"
+    )
+    parser.add_argument(
+        "--account-id",
+        type=str,
+        default=os.getenv("CLOUDFLARE_ACCOUNT_ID"),
+        help="Cloudflare account id, enables listing every vector id (default: $CLOUDFLARE_ACCOUNT_ID)"
+    )
+    parser.add_argument(
+        "--api-token",
+        type=str,
+        default=os.getenv("CLOUDFLARE_API_TOKEN"),
+        help="Cloudflare API token with Vectorize read access (default: $CLOUDFLARE_API_TOKEN)"
+    )
+    parser.add_argument(
+        "--index-name",
+        type=str,
+        default="novanewz-vectors",
+        help="Vectorize index name (default: novanewz-vectors)"
+    )
+    parser.add_argument(
+        "--probe-margin",
+        type=int,
+        default=PROBE_MARGIN,
+        help=f"Without an API token, also probe this many ids above the highest article id (default: {PROBE_MARGIN})"
+    )
+    parser.add_argument(
+        "--queue-file",
+        type=str,
+        default=QUEUE_FILE,
+        help=f"Where to queue articles that need embeddings (default: {QUEUE_FILE})"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report differences without deleting or queueing anything"
+    )
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("NovaNewz - D1 / Vectorize Reconciler")
+    print("=" * 60)
+    print(f"API URL: {args.api_url}")
+    print(f"Vector listing: {'REST API' if args.account_id and args.api_token else 'probe via /vectorize'}")
+    print(f"Dry run: {args.dry_run}")
+    print("=" * 60)
+
+    try:
+        reconcile(
+            args.api_url,
+            account_id=args.account_id,
+            api_token=args.api_token,
+            index_name=args.index_name,
+            probe_margin=args.probe_margin,
+            dry_run=args.dry_run,
+            queue_file=args.queue_file,
+        )
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+    except Exception as e:
+        print(f"\n\n❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Columnar snapshot export and restore of articles plus vectors.
+
+  python snapshot.py export --api-url URL --output snapshot.parquet
+  python snapshot.py restore --api-url URL --input snapshot.parquet
+
+Export streams every D1 article and its Vectorize vector into a Parquet file
+(zstd-compressed columns, embedding as a fixed-size float32 list, written in row groups).
+Restore bulk-loads both stores from the file without any Workers AI inference.
+"""
+
+import requests
+import time
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EMBEDDING_DIMENSIONS = 768  # bge-base-en-v1.5
+PAGE_SIZE = 500  # Articles per export page and per restore bulk request
+VECTOR_FETCH_SIZE = 100  # Vectors per /vectorize get request
+VECTOR_WRITE_SIZE = 200  # Vectors per /vectorize upsert request (~1.5 MB of JSON)
+ROW_GROUP_ROWS = 5000  # Rows buffered before a row group is written
+MAX_RETRIES = 3
+
+SNAPSHOT_SCHEMA = pa.schema([
+    pa.field("id", pa.int64(), nullable=False),
+    pa.field("title", pa.string()),
+    pa.field("content", pa.string()),
+    pa.field("tags", pa.string()),  # JSON array
+    pa.field("author", pa.string()),
+    pa.field("published_at", pa.string()),
+    pa.field("published_ts", pa.int64()),
+    pa.field("created_at", pa.string()),
+    pa.field("updated_at", pa.string()),
+    pa.field("embedding", pa.list_(pa.float32(), EMBEDDING_DIMENSIONS)),  # null if the article had no vector
+    pa.field("vector_metadata", pa.string()),  # JSON, as stored in Vectorize
+])
+
+ARTICLE_COLUMNS = ["id", "title", "content", "tags", "author", "published_at",
+                   "published_ts", "created_at", "updated_at"]
+
+
+def request_with_retry(method, url, **kwargs):
+    """Send a request, backing off on rate limits and transient errors."""
+    for attempt in range(MAX_RETRIES):
+        try:
+            response = requests.request(method, url, timeout=120, **kwargs)
+            if response.status_code in [429, 500, 502, 503] and attempt < MAX_RETRIES - 1:
+                wait_time = 2 ** attempt
+                print(f"    HTTP {response.status_code}, retrying in {wait_time}s (attempt {attempt + 1}/{MAX_RETRIES})...")
+                time.sleep(wait_time)
+                continue
+            response.raise_for_status()
+            return response.json()
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            if attempt == MAX_RETRIES - 1:
+                raise
+            time.sleep(2 ** attempt)
+    raise Exception(f"{method} {url} failed after {MAX_RETRIES} attempts")
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def iter_article_pages(api_url, page_size=PAGE_SIZE):
+    """Stream full articles from D1 in id order."""
+    after_id = 0
+    while True:
+        page = request_with_retry(
+            "GET", f"{api_url}/articles",
+            params={"fields": "all", "after_id": after_id, "limit": page_size}
+        )
+        if page["articles"]:
+            yield page["articles"]
+        if page.get("next_after_id") is None:
+            return
+        after_id = page["next_after_id"]
+
+
+def fetch_vectors(api_url, article_ids):
+    """Fetch {article_id: (values, metadata)} for the given ids."""
+    vectors = {}
+    for i in range(0, len(article_ids), VECTOR_FETCH_SIZE):
+        result = request_with_retry(
+            "POST", f"{api_url}/vectorize",
+            json={"action": "get", "ids": article_ids[i:i + VECTOR_FETCH_SIZE]}
+        )
+        for vector in result["vectors"]:
+            vectors[vector["article_id"]] = (vector["values"], vector.get("metadata") or {})
+    return vectors
+
+
+def build_batch(articles, vectors):
+    """Columnar record batch for one page of articles."""
+    columns = {name: [a.get(name) for a in articles] for name in ARTICLE_COLUMNS}
+    columns["tags"] = [json.dumps(t) if t is not None else None for t in columns["tags"]]
+
+    embeddings = []
+    metadata = []
+    for article in articles:
+        values, meta = vectors.get(article["id"], (None, None))
+        if values is not None and len(values) != EMBEDDING_DIMENSIONS:
+            print(f"    Skipping vector for article {article['id']}: {len(values)} dimensions")
+            values = meta = None
+        embeddings.append(values)
+        metadata.append(json.dumps(meta) if meta is not None else None)
+    columns["embedding"] = embeddings
+    columns["vector_metadata"] = metadata
+
+    return pa.RecordBatch.from_pydict(columns, schema=SNAPSHOT_SCHEMA)
+
+
+def export_snapshot(api_url, output_file, row_group_rows=ROW_GROUP_ROWS):
+    """Stream D1 + Vectorize into a Parquet snapshot, one row group at a time."""
+    print(f"Exporting snapshot to {output_file}...")
+    metadata = {
+        b"novanewz.snapshot_created_at": datetime.now().isoformat().encode(),
+        b"novanewz.source_api": api_url.encode(),
+        b"novanewz.embedding_model": b"@cf/baai/bge-base-en-v1.5",
+    }
+    writer = pq.ParquetWriter(
+        output_file,
+        SNAPSHOT_SCHEMA.with_metadata(metadata),
+        compression="zstd",
+        compression_level=6,
+        use_dictionary=["author", "tags"],
+    )
+
+    buffered = []
+    buffered_rows = 0
+    total = 0
+    with_vectors = 0
+    try:
+        for articles in iter_article_pages(api_url):
+            vectors = fetch_vectors(api_url, [a["id"] for a in articles])
+            batch = build_batch(articles, vectors)
+            buffered.append(batch)
+            buffered_rows += batch.num_rows
+            total += batch.num_rows
+            with_vectors += len(vectors)
+            print(f"  {total} articles exported ({with_vectors} with vectors)")
+
+            if buffered_rows >= row_group_rows:
+                writer.write_table(pa.Table.from_batches(buffered), row_group_size=buffered_rows)
+                buffered = []
+                buffered_rows = 0
+
+        if buffered:
+            writer.write_table(pa.Table.from_batches(buffered), row_group_size=buffered_rows)
+    finally:
+        writer.close()
+
+    size_mb = os.path.getsize(output_file) / 1024 / 1024
+    print(f"\nSnapshot complete: {total} articles, {with_vectors} vectors, {size_mb:.1f} MiB")
+    return total, with_vectors
+
+
+# ---------------------------------------------------------------------------
+# Restore
+# ---------------------------------------------------------------------------
+
+def restore_batch(api_url, batch):
+    """Write one record batch to D1 and Vectorize. Returns (articles, vectors) written."""
+    table = pa.Table.from_batches([batch])
+    articles = table.select(ARTICLE_COLUMNS).to_pylist()
+    for article in articles:
+        article["tags"] = json.loads(article["tags"]) if article["tags"] else []
+
+    # Decode the fixed-size list column in one go rather than row by row
+    embedding = batch.column("embedding")
+    valid = np.asarray(embedding.is_valid())
+    values = np.asarray(embedding.flatten()).reshape(-1, EMBEDDING_DIMENSIONS)
+    if embedding.null_count:
+        # flatten() skips null lists, so map valid rows onto consecutive value rows
+        row_index = np.cumsum(valid) - 1
+    else:
+        row_index = np.arange(len(embedding))
+
+    ids = batch.column("id").to_pylist()
+    metadata = batch.column("vector_metadata").to_pylist()
+    for i, article in enumerate(articles):
+        # Articles without a stored vector are left for the Worker's indexing sweep
+        article["index_status"] = "indexed" if valid[i] else "pending"
+    request_with_retry("POST", f"{api_url}/articles/bulk", json={"articles": articles})
+
+    vectors = [
+        {"article_id": ids[i], "values": values[row_index[i]].tolist(), "metadata": json.loads(metadata[i] or "{}")}
+        for i in range(len(ids)) if valid[i]
+    ]
+    for i in range(0, len(vectors), VECTOR_WRITE_SIZE):
+        request_with_retry(
+            "POST", f"{api_url}/vectorize",
+            json={"action": "upsert", "vectors": vectors[i:i + VECTOR_WRITE_SIZE]}
+        )
+
+    return len(articles), len(vectors)
+
+
+def restore_snapshot(api_url, input_file, workers=4):
+    """Bulk-load D1 and Vectorize from a snapshot, with several batches in flight."""
+    parquet = pq.ParquetFile(input_file)
+    total_rows = parquet.metadata.num_rows
+    print(f"Restoring {total_rows} articles from {input_file} with {workers} workers...")
+
+    start = time.perf_counter()
+    restored_articles = 0
+    restored_vectors = 0
+    failures = []  # (first row, row count, error) of batches that raised
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = []  # (first row, row count, future) in file order
+        next_row = 0
+        for batch in parquet.iter_batches(batch_size=PAGE_SIZE):
+            pending.append((next_row, batch.num_rows, pool.submit(restore_batch, api_url, batch)))
+            next_row += batch.num_rows
+            # Bound memory: never hold more than 2x workers decoded batches
+            if len(pending) >= workers * 2:
+                first_row, num_rows, future = pending.pop(0)
+                try:
+                    articles, vectors = future.result()
+                except Exception as e:
+                    failures.append((first_row, num_rows, e))
+                    break  # Submit nothing more
+                restored_articles += articles
+                restored_vectors += vectors
+                print(f"  {restored_articles}/{total_rows} articles, {restored_vectors} vectors")
+        # Settle the batches still in flight, even after a failure, so the counts are exact
+        for first_row, num_rows, future in pending:
+            try:
+                articles, vectors = future.result()
+            except Exception as e:
+                failures.append((first_row, num_rows, e))
+                continue
+            restored_articles += articles
+            restored_vectors += vectors
+
+    if failures:
+        print(f"\nRestore stopped: {restored_articles}/{total_rows} articles and {restored_vectors} vectors restored")
+        for first_row, num_rows, error in sorted(failures, key=lambda f: f[0]):
+            print(f"  Rows {first_row}-{first_row + num_rows - 1} failed: {error}")
+        print("Writes are upserts, so running the restore again is safe")
+        raise failures[0][2]
+
+    elapsed = time.perf_counter() - start
+    print(f"\nRestore complete: {restored_articles} articles, {restored_vectors} vectors "
+          f"in {elapsed:.1f}s ({restored_articles / max(elapsed, 1e-9):.0f} articles/s)")
+    return restored_articles, restored_vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot or restore NovaNewz articles and vectors")
+    parser.add_argument("command", choices=["export", "restore"], help="export to or restore from a snapshot")
+    parser.add_argument(
+        "--api-url",
+        type=str,
+        default=os.getenv("API_BASE_URL", "http://localhost:8787"),
+        help="Base URL of the Workers API"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=f"novanewz_snapshot_{datetime.now():%Y%m%d}.parquet",
+        help="Snapshot file to write (export)"
+    )
+    parser.add_argument("--input", type=str, help="Snapshot file to read (restore)")
+    parser.add_argument(
+        "--row-group-rows",
+        type=int,
+        default=ROW_GROUP_ROWS,
+        help=f"Rows per Parquet row group (export, default: {ROW_GROUP_ROWS})"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Concurrent bulk writes (restore, default: 4)"
+    )
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"NovaNewz - Snapshot {args.command}")
+    print("=" * 60)
+    print(f"API URL: {args.api_url}")
+    print("=" * 60)
+
+    try:
+        if args.command == "export":
+            export_snapshot(args.api_url, args.output, args.row_group_rows)
+        else:
+            if not args.input:
+                parser.error("restore requires --input")
+            restore_snapshot(args.api_url, args.input, args.workers)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+    except Exception as e:
+        print(f"\n\n❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+UTC hour windows for jobs that should only run off-peak
+(history cache pre-warming, dead-letter retries).
+"""
+
+from datetime import datetime
+
+
+def parse_window(value):
+    """Parse an 'START-END' UTC hour window such as '1-6'."""
+    start, end = value.split("-")
+    return int(start) % 24, int(end) % 24
+
+
+def in_off_peak_window(start_hour, end_hour, now=None):
+    """Check whether the current UTC hour falls in [start_hour, end_hour), wrapping past midnight."""
+    hour = (now or datetime.utcnow()).hour
+    if start_hour <= end_hour:
+        return start_hour <= hour < end_hour
+    return hour >= start_hour or hour < end_hour
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Token-budget batch packer for embedding requests.
+Estimates bge-base-en-v1.5 token counts locally, splits long articles into chunks that fit
+the model's 512-token window, and packs chunks into batches under per-request token,
+byte and text-count budgets. The Worker pools each article's chunk vectors back into one.
+"""
+
+import json
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+MODEL_MAX_TOKENS = 512  # bge-base-en-v1.5 context window, including [CLS] and [SEP]
+SPECIAL_TOKENS = 2  # [CLS] + [SEP]
+SAFETY_MARGIN = 0.9  # Keep chunks under 90% of the window since token counts are estimates
+
+MAX_BATCH_TOKENS = 16384  # Estimated tokens per /embed request
+MAX_BATCH_BYTES = 256 * 1024  # Serialized request body size
+MAX_BATCH_TEXTS = 100  # Workers AI limit on texts per embedding call
+MAX_CHUNKS_PER_ARTICLE = 8  # Longer articles are pooled from their first chunks only
+
+# WordPiece splits on whitespace and punctuation, then breaks long words into sub-words
+_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def _piece_tokens(piece: str) -> int:
+    """Approximate WordPiece tokens for one word or punctuation mark."""
+    if len(piece) <= 4 or not piece.isascii():
+        # Short words are usually whole vocabulary entries; non-ASCII falls back to one per char
+        return 1 if piece.isascii() else len(piece)
+    # Longer words split into roughly 4-character sub-words (over-estimates common words)
+    return (len(piece) + 3) // 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of bge tokens for text, including special tokens."""
+    return SPECIAL_TOKENS + sum(_piece_tokens(p) for p in _PIECE_RE.findall(text or ""))
+
+
+def chunk_text(text: str, max_tokens: int = int(MODEL_MAX_TOKENS * SAFETY_MARGIN)) -> List[str]:
+    """Split text on word boundaries into chunks whose estimated size stays under max_tokens."""
+    budget = max_tokens - SPECIAL_TOKENS
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for word in (text or "").split():
+        word_tokens = sum(_piece_tokens(p) for p in _PIECE_RE.findall(word))
+        if current and current_tokens + word_tokens > budget:
+            chunks.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(word)
+        current_tokens += word_tokens
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def build_item(article: Dict, max_chunks: int = MAX_CHUNKS_PER_ARTICLE, stats: Optional[Dict] = None) -> Dict:
+    """
+    Turn an article into an /embed batch item with its text split into chunks.
+    With stats, counts articles cut down to max_chunks under stats["truncated"].
+    """
+    chunks = chunk_text(article.get("content", ""))
+    if len(chunks) > max_chunks:
+        chunks = chunks[:max_chunks]
+        if stats is not None:
+            stats["truncated"] = stats.get("truncated", 0) + 1
+    return {
+        "article_id": article.get("id"),
+        "texts": chunks,
+        "title": article.get("title"),
+        "tags": article.get("tags", []),
+        "published_at": article.get("published_at"),
+        "author": article.get("author"),
+        "updated_at": article.get("updated_at"),
+    }
+
+
+def item_cost(item: Dict):
+    """(estimated tokens, serialized bytes, text count) an item adds to a batch."""
+    tokens = sum(estimate_tokens(t) for t in item["texts"])
+    size = len(json.dumps(item).encode("utf-8")) + 1  # +1 for the separating comma
+    return tokens, size, len(item["texts"])
+
+
+def pack_batches(articles: Iterable[Dict], max_tokens: int = MAX_BATCH_TOKENS,
+                 max_bytes: int = MAX_BATCH_BYTES, max_texts: int = MAX_BATCH_TEXTS,
+                 max_chunks: int = MAX_CHUNKS_PER_ARTICLE, stats: Optional[Dict] = None) -> Iterator[List[Dict]]:
+    """
+    Greedily pack articles, in the order given, into batches under every budget.
+    Order is preserved (next-fit) so a priority order from the scheduler still holds.
+    An article's chunks always travel in the same batch so the Worker can pool them.
+    With stats, articles with no text to embed are listed under stats["skipped"] and
+    truncated articles are counted under stats["truncated"].
+    """
+    batch = []
+    batch_tokens = batch_bytes = batch_texts = 0
+
+    for article in articles:
+        item = build_item(article, max_chunks, stats)
+        if not item["texts"]:
+            if stats is not None:
+                stats.setdefault("skipped", []).append(article)
+            continue
+        tokens, size, texts = item_cost(item)
+
+        if batch and (batch_tokens + tokens > max_tokens
+                      or batch_bytes + size > max_bytes
+                      or batch_texts + texts > max_texts):
+            yield batch
+            batch = []
+            batch_tokens = batch_bytes = batch_texts = 0
+
+        # An item larger than the budget on its own still goes out, alone
+        batch.append(item)
+        batch_tokens += tokens
+        batch_bytes += size
+        batch_texts += texts
+
+    if batch:
+        yield batch